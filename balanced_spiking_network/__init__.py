@@ -1,13 +1,37 @@
-from .network import BalancedSpikingNetwork
-from .parameters import NeuralParameters
-from .simulation import SimulationEngine
-from . import inputs
-from . import utilities
+import importlib
+
+# Public names and the modules defining them. They are imported on first access,
+# so that importing the package (e.g. for `bsn --help`) does not load numpy
+_EXPORTS = {
+    'BalancedSpikingNetwork': 'network',
+    'NeuralParameters': 'parameters',
+    'SparseConnectivity': 'connectivity',
+    'SimulationEngine': 'simulation',
+    'SpikeTrain': 'recording',
+}
+_SUBMODULES = ('inputs', 'utilities')
 
 __all__ = [
     'BalancedSpikingNetwork',
     'NeuralParameters',
+    'SparseConnectivity',
     'SimulationEngine',
+    'SpikeTrain',
     'inputs',
     'utilities',
 ]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module('.' + _EXPORTS[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
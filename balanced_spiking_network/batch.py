@@ -0,0 +1,94 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from .cli import check_arguments, run
+from .sweep import run_arguments, structure_key, _network, _structure_cache
+
+
+def run_jobs(jobs, output_dir=".", cache_size=4):
+    """
+    Run simulation jobs one after another in this process, reusing built networks.
+
+    Each job is a dict of `bsn` options with one value each, as in a sweep
+    grid. Networks are kept in memory by structure (see
+    `sweep.STRUCTURE_KEYS`): jobs that differ only in trial, inputs,
+    duration and the like reuse the connectivity and input neurons already
+    built, so only the first job of each network pays for its construction,
+    and no job pays for interpreter startup and imports. A job that fails is
+    reported and the remaining jobs still run.
+
+    Parameters:
+    jobs (iterable): Job specifications as dicts or JSON strings; may be
+        consumed lazily, e.g. lines read from stdin
+    output_dir (str): Directory of the outputs of jobs that do not set
+        "output" (`job_<index>.npz`, or a `job_<index>` directory with "chunk")
+    cache_size (int): Networks kept in memory
+
+    Yields:
+    dict: Status of each job: "job" (index), "output", "network" ("built" or
+        "reused"), "seconds", and "error" if it failed
+    """
+    for index, spec in enumerate(jobs):
+        record = {"job": index}
+        start = time.perf_counter()
+        try:
+            if isinstance(spec, str):
+                spec = json.loads(spec)
+            if "resume" in spec:
+                raise ValueError("Jobs cannot resume chunked runs; run 'bsn --resume' instead")
+            if "output" not in spec:
+                os.makedirs(output_dir, exist_ok=True)
+                ext = "" if "chunk" in spec else ".pkl" if spec.get("format") == "pickle" else ".npz"
+                spec = dict(spec, output=os.path.join(output_dir, f"job_{index}{ext}"))
+            try:
+                args = run_arguments(spec)
+            except SystemExit:
+                raise ValueError("Invalid arguments (see stderr)") from None
+            check_arguments(args)
+            record["network"] = "reused" if structure_key(args) in _structure_cache else "built"
+            record["output"] = run(args, _network(args, cache_size))
+        except Exception as error:
+            record["error"] = f"{type(error).__name__}: {error}"
+        record["seconds"] = time.perf_counter() - start
+        yield record
+
+
+def main(argv):
+    command, argv = argv[0], argv[1:]
+    if command == "serve":
+        description = ("Run jobs read from stdin, one JSON object of bsn options per line, in one "
+                       "long-lived process that keeps built networks in memory")
+    else:
+        description = "Run a file of jobs in one process that keeps built networks in memory"
+    parser = argparse.ArgumentParser(
+        prog=f"bsn {command}",
+        description=description,
+        epilog="Each job is a JSON object mapping bsn options to values, e.g. "
+               '{"trial": 3, "mu_1": "sine", "output": "trial_3.npz"}. '
+               "One JSON status line per job is written to stdout."
+    )
+    if command == "batch":
+        parser.add_argument("--jobs", type=str, required=True,
+                            help="JSON lines file with one job per line ('-' reads stdin)")
+    parser.add_argument("-o", "--output_dir", type=str, default=".",
+                        help="Directory of the outputs of jobs that do not set 'output'")
+    parser.add_argument("--cache_size", type=int, default=4,
+                        help="Number of networks kept in memory")
+
+    args = parser.parse_args(argv)
+
+    if command == "serve" or args.jobs == "-":
+        source = contextlib.nullcontext(sys.stdin)
+    else:
+        source = open(args.jobs)
+    failed = 0
+    with source as lines:
+        jobs = (line for line in lines if line.strip())
+        for record in run_jobs(jobs, output_dir=args.output_dir, cache_size=args.cache_size):
+            print(json.dumps(record), flush=True)
+            failed += "error" in record
+    if failed:
+        return 1
@@ -0,0 +1,215 @@
+import argparse
+import itertools
+import json
+import os
+import pickle
+import platform
+import sys
+import tempfile
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Version of the JSON layout written by `run_benchmarks`
+BENCH_FORMAT_VERSION = 1
+
+# Timings compared by `compare`; larger is worse for all of them
+COMPARED_KEYS = ("build_s", "step_ms", "peak_rss_mb", "npz_write_s", "npz_read_s", "pickle_write_s")
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where `resource` is unavailable (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def _format_mb(value):
+    return "     n/a" if value is None else f"{value:8.1f} MB"
+
+
+def bench_case(N, C, connectivity_format="sparse", connectivity_method="legacy", backend="numpy",
+               dtype="float64", duration=100.0, mu_zero=18.0, threads=None):
+    """
+    Benchmark construction, stepping and output of one network.
+
+    Runs in the calling process; `run_benchmarks` calls it in a fresh
+    process per case so that the peak RSS belongs to that case alone.
+
+    Returns:
+    dict: Parameters and measurements of the case
+    """
+    from .network import BalancedSpikingNetwork
+    from .simulation import SimulationEngine
+    from .recording import save_spikes_npz, load_spikes
+
+    result = {"N": N, "C": C, "connectivity_format": connectivity_format,
+              "connectivity_method": connectivity_method, "backend": backend, "dtype": dtype,
+              "duration": duration, "mu_zero": mu_zero, "threads": threads}
+
+    start = time.perf_counter()
+    net = BalancedSpikingNetwork(N=N, C=C, mu_zero=mu_zero, connectivity_format=connectivity_format,
+                                 connectivity_method=connectivity_method, dtype=dtype)
+    result["build_s"] = time.perf_counter() - start
+
+    engine = SimulationEngine(net, backend=backend, threads=threads)
+    if backend == "numba":
+        engine.run(10 * net.params.dt)  # Compile outside the timed run
+        net.reset_state()
+        engine.reset()
+    n_steps = int(round(duration / net.params.dt))
+    start = time.perf_counter()
+    spikes = engine.run(duration, record_spikes=True)
+    elapsed = time.perf_counter() - start
+    result.update(steps=n_steps, step_ms=1000 * elapsed / n_steps, spikes=len(spikes),
+                  spikes_per_s=len(spikes) / elapsed,
+                  rate_hz=len(spikes) / N / (duration / 1000))
+
+    data = {"spikes": spikes, "input_1_neurons": net.input_neurons[0], "input_2_neurons": net.input_neurons[1]}
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "spikes.npz")
+        start = time.perf_counter()
+        save_spikes_npz(data, filename)
+        result["npz_write_s"] = time.perf_counter() - start
+        result["npz_bytes"] = os.path.getsize(filename)
+        start = time.perf_counter()
+        load_spikes(filename)
+        result["npz_read_s"] = time.perf_counter() - start
+
+        filename = os.path.join(directory, "spikes.pkl")
+        start = time.perf_counter()
+        with open(filename, "wb") as f:
+            pickle.dump(dict(data, spikes=spikes.to_list()), f)
+        result["pickle_write_s"] = time.perf_counter() - start
+        result["pickle_bytes"] = os.path.getsize(filename)
+
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def environment():
+    """Versions and machine the benchmarks ran on."""
+    import numpy as np
+    try:
+        from importlib.metadata import version
+        package_version = version("balanced-spiking-network")
+    except Exception:
+        package_version = None
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+    return {"package": package_version, "python": platform.python_version(), "numpy": np.__version__,
+            "numba": numba_version, "platform": platform.platform(), "processor": platform.processor(),
+            "cpus": os.cpu_count()}
+
+
+def run_benchmarks(sizes=(1000, 10000, 50000), connections=(100, 1000), isolate=True, **options):
+    """
+    Benchmark every combination of network size and in-degree.
+
+    Parameters:
+    sizes (tuple): Network sizes N
+    connections (tuple): In-degrees C (combinations with C > N are skipped)
+    isolate (bool): Run each case in a fresh process to measure its own peak RSS
+    options: Further arguments of `bench_case`
+
+    Returns:
+    dict: Environment and one result per case, ready to be written as JSON
+    """
+    cases = [(N, C) for N, C in itertools.product(sizes, connections) if C <= N]
+    results = []
+    for N, C in cases:
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                result = executor.submit(bench_case, N, C, **options).result()
+        else:
+            result = bench_case(N, C, **options)
+        print(f"N={N:>6} C={C:>5}  build {result['build_s']:8.3f} s  step {result['step_ms']:8.3f} ms  "
+              f"{result['spikes_per_s']:12.0f} spikes/s  peak RSS {_format_mb(result['peak_rss_mb'])}", flush=True)
+        results.append(result)
+    return {"version": BENCH_FORMAT_VERSION, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": environment(), "results": results}
+
+
+def compare(baseline, current, threshold=1.1):
+    """
+    Compare two benchmark reports case by case.
+
+    Returns:
+    list: (case, key, baseline value, current value, ratio) for every
+        measurement in COMPARED_KEYS that grew by more than `threshold`
+    """
+    def case(result):
+        return tuple(result.get(key) for key in ("N", "C", "connectivity_format", "connectivity_method",
+                                                 "backend", "dtype", "duration", "threads"))
+
+    baseline_results = {case(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        reference = baseline_results.get(case(result))
+        if reference is None:
+            continue
+        for key in COMPARED_KEYS:
+            if reference[key] is None or result[key] is None:
+                continue
+            if reference[key] > 0 and result[key] / reference[key] > threshold:
+                regressions.append((case(result), key, reference[key], result[key], result[key] / reference[key]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="bsn bench",
+        description="Benchmark network construction, simulation steps and spike output"
+    )
+    parser.add_argument("--N", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="Network sizes")
+    parser.add_argument("--C", type=int, nargs="+", default=[100, 1000],
+                        help="Numbers of connections per neuron")
+    parser.add_argument("--connectivity_format", choices=['dense', 'sparse'], default='sparse',
+                        help="Storage of the connectivity matrix")
+    parser.add_argument("--connectivity_method", choices=['legacy', 'v2', 'rows'], default='legacy',
+                        help="Connectivity sampler")
+    parser.add_argument("--backend", choices=['numpy', 'numba'], default='numpy',
+                        help="Simulation backend")
+    parser.add_argument("--dtype", choices=['float64', 'float32'], default='float64',
+                        help="Floating point precision")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Parallel neuron blocks of the numba backend (sparse connectivity)")
+    parser.add_argument("-d", "--duration", type=float, default=100.0,
+                        help="Simulated time per case in ms")
+    parser.add_argument("--mu_zero", type=float, default=18.0,
+                        help="External constant input (the default keeps the network active)")
+    parser.add_argument("-o", "--output", type=str, default="bench.json",
+                        help="JSON file receiving the results")
+    parser.add_argument("--compare", type=str, default=None, metavar="BASELINE",
+                        help="JSON file of an earlier run; report measurements that grew by more than --threshold")
+    parser.add_argument("--threshold", type=float, default=1.1,
+                        help="Ratio to the baseline above which a measurement counts as a regression")
+
+    args = parser.parse_args(argv)
+    if args.threads is not None and (args.backend != "numba" or args.connectivity_format != "sparse"):
+        parser.error("--threads requires --backend numba and --connectivity_format sparse")
+
+    report = run_benchmarks(sizes=args.N, connections=args.C,
+                            connectivity_format=args.connectivity_format,
+                            connectivity_method=args.connectivity_method, backend=args.backend,
+                            dtype=args.dtype, duration=args.duration, mu_zero=args.mu_zero,
+                            threads=args.threads)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, threshold=args.threshold)
+        for case, key, before, after, ratio in regressions:
+            print(f"Regression N={case[0]} C={case[1]}: {key} {before:.4g} -> {after:.4g} ({ratio:.2f}x)")
+        if regressions:
+            return 1
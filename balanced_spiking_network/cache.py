@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from .connectivity import SparseConnectivity
+
+# Bump whenever the stored layout or the generated structures change
+CACHE_FORMAT_VERSION = 2
+
+
+class NetworkCache:
+    """
+    Content-addressed on-disk cache of generated network structures.
+
+    Each entry is a directory of `.npy` files (thresholds, connectivity and
+    input neurons) named by a hash of the construction parameters and the
+    cache format version. Connectivity is stored as int32 presynaptic
+    indices in both formats; dense matrices are rebuilt from them on load.
+    All other arrays are loaded memory-mapped and read-only, so a cached
+    network starts without regenerating or copying them. When the cache
+    grows beyond `max_bytes`, the least recently used entries are removed.
+
+    Attributes:
+    directory (str): Cache directory
+    max_bytes (int): Size limit of the cache in bytes (None for no limit)
+    """
+
+    def __init__(self, directory, max_bytes=10 * 1024**3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, net):
+        """Hash of everything that determines the generated structures of `net`."""
+        spec = {
+            "version": CACHE_FORMAT_VERSION,
+            "N": net.N, "C": net.C, "f": net.f, "g": net.g, "J_mean": net.J_mean,
+            "V_th_mean": net.V_th_mean, "V_th_std": net.V_th_std,
+            "V_th_distribution": net.V_th_distribution,
+            "session": net.session,
+            "connectivity_format": net.connectivity_format,
+            "connectivity_method": net.connectivity_method,
+        }
+        if net.dtype != np.float64:
+            # Only added for float32, so that existing float64 entries keep their keys
+            spec["dtype"] = net.dtype.name
+        # Normalize ints and floats (e.g. g=5 and g=5.0) to the same key
+        spec = {k: float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else v
+                for k, v in spec.items()}
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, net):
+        """
+        Memory-map the cached structures of `net`.
+
+        Returns:
+        tuple: (V_th, connectivity, input_neurons), or None if not cached
+        """
+        path = self._path(self.key(net))
+
+        def array(name):
+            return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            os.utime(path)  # Mark as recently used
+            if meta["connectivity_format"] == "sparse":
+                connectivity = SparseConnectivity(net.N, net.N_E, array("indptr"), array("indices"),
+                                                  meta["exc_weight"], meta["inh_weight"],
+                                                  out_indptr=array("out_indptr"),
+                                                  out_indices=array("out_indices"))
+            elif "W" in meta.get("arrays", ()):
+                connectivity = array("W")
+            else:
+                connectivity = _dense_matrix(array("indices"), net.N_E, meta["exc_weight"],
+                                             meta["inh_weight"], net.dtype)
+            return array("V_th"), connectivity, (array("input_1_neurons"), array("input_2_neurons"))
+        except FileNotFoundError:
+            # Not cached, or evicted by another process while loading
+            return None
+
+    def store(self, net):
+        """Write the structures of `net` to the cache and evict old entries if needed."""
+        key = self.key(net)
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        arrays = {
+            "V_th": net.V_th,
+            "input_1_neurons": net.input_neurons[0],
+            "input_2_neurons": net.input_neurons[1],
+        }
+        meta = {"connectivity_format": net.connectivity_format}
+        W = net.connectivity
+        if isinstance(W, SparseConnectivity):
+            out_indptr, out_indices = W.outgoing()
+            arrays.update(indptr=W.indptr, indices=W.indices,
+                          out_indptr=out_indptr, out_indices=out_indices)
+            meta.update(exc_weight=W.exc_weight, inh_weight=W.inh_weight)
+        else:
+            exc_weight, inh_weight = net.J_mean, -net.J_mean * net.g
+            indices = _dense_indices(W, net.N_E, exc_weight, inh_weight)
+            if indices is not None:
+                arrays["indices"] = indices
+                meta.update(exc_weight=exc_weight, inh_weight=inh_weight)
+            else:
+                # Not a fixed in-degree matrix with one weight per population
+                arrays["W"] = W
+        meta["arrays"] = sorted(arrays)
+
+        # Write into a private directory and rename it into place, so that
+        # readers never see a partial entry
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+        try:
+            for name, value in arrays.items():
+                np.save(os.path.join(tmp_path, name + ".npy"), np.asarray(value))
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another process stored the same entry first
+            if not os.path.exists(path):
+                raise
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+        self.evict(keep=key)
+
+    def entries(self):
+        """Return (key, size in bytes, last use) of every cache entry."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for key in os.listdir(self.directory):
+            path = self._path(key)
+            if ".tmp-" in key or not os.path.isdir(path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+            entries.append((key, size, os.stat(path).st_mtime))
+        return entries
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in `max_bytes`."""
+        if self.max_bytes is None:
+            return
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._path(key), ignore_errors=True)
+            total -= size
+
+
+def _dense_matrix(indices, N_E, exc_weight, inh_weight, dtype):
+    """Dense matrix with the weight of its population at the (N, C) presynaptic `indices` of each row."""
+    N = len(indices)
+    W = np.zeros((N, N), dtype=dtype)
+    W[np.arange(N)[:, None], indices] = np.where(np.asarray(indices) < N_E, exc_weight, inh_weight)
+    return W
+
+
+def _dense_indices(W, N_E, exc_weight, inh_weight):
+    """
+    Presynaptic indices of a dense matrix as an (N, C) int32 array.
+
+    Returns:
+    numpy.ndarray: Sorted indices of every row, or None if the rows do not
+        all have the same number of connections with the weight of their
+        population, so that `_dense_matrix` would not restore `W`
+    """
+    counts = np.count_nonzero(W, axis=1)
+    if len(counts) == 0 or np.any(counts != counts[0]):
+        return None
+    indices = np.nonzero(W)[1].astype(np.int32).reshape(len(W), counts[0])
+    expected = np.where(indices < N_E, exc_weight, inh_weight).astype(W.dtype)
+    if not np.array_equal(W[np.arange(len(W))[:, None], indices], expected):
+        return None
+    return indices
@@ -0,0 +1,90 @@
+import json
+import os
+import numpy as np
+
+# Bump whenever the stored state changes
+CHECKPOINT_VERSION = 1
+
+# Arrays of the spikes in transit and spike offsets, stored for the exact integrator only
+EXACT_STATE = ("arrivals", "arrival_offsets", "n_arrivals", "spike_offsets")
+
+
+def _generators(net):
+    """Random generators of a network, by name."""
+    generators = {"rng_init": net.rng_init, "rng_input": net.rng_input}
+    generators.update((f"rng_{i}", rng) for i, rng in enumerate(net.rng))
+    return generators
+
+
+def save_checkpoint(filename, engine, step, writer=None, args=None):
+    """
+    Save everything needed to continue a chunked run from time step `step`.
+
+    Stores the network state (V, last_spike, refractory), the synaptic input
+    in transit (with the exact integrator: the spikes in transit and the
+    offsets of the last spikes within their steps), the states of all random
+    generators of the network, the number of spikes already written by
+    `writer` and the run arguments. The file is replaced atomically, so a
+    run killed while checkpointing keeps its previous checkpoint.
+
+    Parameters:
+    filename (str): Checkpoint file
+    engine (SimulationEngine): Engine of the run, between two chunks
+    step (int): Time steps of the recording period completed so far
+    writer (SpikeWriter): Spike output of the run
+    args (dict): Run arguments (JSON-serializable)
+    """
+    net = engine.net
+    meta = {
+        "version": CHECKPOINT_VERSION,
+        "step": step,
+        "pending_pos": engine._pending_pos,
+        "n_spikes": None if writer is None else writer.n_spikes,
+        "generators": {name: rng.bit_generator.state for name, rng in _generators(net).items()},
+        "args": args,
+    }
+    pending = np.empty(0) if engine._pending is None else engine._pending
+    arrays = {}
+    if engine._arrivals is not None:
+        arrays = dict(zip(EXACT_STATE, (*engine._arrivals, engine._spike_offsets)))
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as f:
+        np.savez_compressed(f, V=net.V, last_spike=net.last_spike, refractory=net.refractory,
+                            pending=pending, meta=json.dumps(meta), **arrays)
+    os.replace(tmp_filename, filename)
+
+
+def load_checkpoint(filename):
+    """
+    Read a checkpoint written by `save_checkpoint`.
+
+    Returns:
+    dict: The stored metadata ("step", "n_spikes", "args", ...) and arrays
+    """
+    with np.load(filename) as npz:
+        checkpoint = json.loads(str(npz["meta"]))
+        if checkpoint["version"] != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {checkpoint['version']} in {filename}")
+        for name in ("V", "last_spike", "refractory", "pending"):
+            checkpoint[name] = npz[name]
+        for name in EXACT_STATE:
+            checkpoint[name] = npz[name] if name in npz.files else None
+    return checkpoint
+
+
+def restore_checkpoint(checkpoint, engine):
+    """Restore the network state, synaptic input in transit and random generators of `engine`."""
+    net = engine.net
+    if checkpoint["V"].shape != (net.N,):
+        raise ValueError(f"Checkpoint is for {checkpoint['V'].shape[0]} neurons, network has {net.N}")
+    net.set_state((checkpoint["V"].copy(), checkpoint["last_spike"].copy(), checkpoint["refractory"].copy()))
+    pending = checkpoint["pending"]
+    engine._pending = pending.copy() if pending.size else None
+    engine._pending_pos = checkpoint["pending_pos"]
+    if checkpoint["spike_offsets"] is None:
+        engine._arrivals = engine._spike_offsets = None
+    else:
+        engine._arrivals = tuple(checkpoint[name].copy() for name in EXACT_STATE[:3])
+        engine._spike_offsets = checkpoint["spike_offsets"].copy()
+    for name, rng in _generators(net).items():
+        rng.bit_generator.state = checkpoint["generators"][name]
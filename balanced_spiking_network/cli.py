@@ -1,23 +1,30 @@
 import argparse
+import os
 import pickle
-import numpy as np
-from .network import BalancedSpikingNetwork
-from .simulation import SimulationEngine
-from .inputs import (
-    generate_input_sine as gen_sine,
-    generate_input_bumps as gen_bump
-)
+import sys
 
+# numpy and the simulation modules are imported by the functions that need them,
+# so that `bsn --help` and argument errors return without loading them
 
 
-def main():
+
+def build_parser():
+    """Return the argument parser of a single simulation run."""
     parser = argparse.ArgumentParser(
-        description="Run balanced spiking network simulation"
+        prog="bsn",
+        description="Run balanced spiking network simulation",
+        epilog="Subcommands: 'bsn sweep --help' runs parameter sweeps in parallel, "
+               "'bsn batch --help' runs many jobs in one process reusing built networks, "
+               "'bsn bench --help' benchmarks construction, stepping and output"
     )
     parser.add_argument("-d", "--duration", type=float, default=1000.0,
                         help="Simulation duration in ms")
-    parser.add_argument("-o", "--output", type=str, default="spikes.pkl",
-                        help="Output spike data file (pickle format)")
+    parser.add_argument("-o", "--output", type=str, default=None,
+                        help="Output spike data file, or directory with --chunk "
+                             "(default: spikes.npz, or spikes with --chunk)")
+    parser.add_argument("--format", choices=['npz', 'pickle'], default=None,
+                        help="Output format: compressed npz columns, or the legacy pickled list of "
+                             "(t, i) tuples (default: pickle for .pkl/.pickle files, npz otherwise)")
     parser.add_argument("--mu_zero", type=float, default=15.1,
                         help="External constant input")
     parser.add_argument("--V_th_std", type=float, default=0.0,
@@ -46,54 +53,268 @@ def main():
                         help="Session number for RNG")
     parser.add_argument("--trial", type=int, default=0,
                         help="Trial number for RNG")
+    parser.add_argument("--connectivity_format", choices=['dense', 'sparse'], default='dense',
+                        help="Storage of the connectivity matrix (dense NxN or sparse CSR)")
+    parser.add_argument("--connectivity_method", choices=['legacy', 'v2', 'rows'], default='legacy',
+                        help="Connectivity sampler (legacy per-neuron loop, vectorized v2, or rows with one "
+                             "seed per neuron as used by distributed runs)")
+    parser.add_argument("--dtype", choices=['float64', 'float32'], default='float64',
+                        help="Floating point precision of network state, dense weights and inputs")
+    parser.add_argument("--cache_dir", type=str, default=os.environ.get("BSN_CACHE_DIR"),
+                        help="Directory caching generated networks across runs (default: $BSN_CACHE_DIR)")
+    parser.add_argument("--input_method", choices=['legacy', 'lazy'], default='legacy',
+                        help="Input generation (legacy full noise matrices, or lazy sources generating "
+                             "noise block by block with bounded memory)")
+    parser.add_argument("--chunk", type=float, default=None,
+                        help="Simulate in windows of this many ms and append the spikes of each window "
+                             "to the output directory, keeping memory bounded for long runs")
+    parser.add_argument("--checkpoint_interval", type=float, default=None,
+                        help="With --chunk, save a checkpoint to the output directory every this many ms "
+                             "of simulated time")
+    parser.add_argument("--resume", type=str, default=None, metavar="DIRECTORY",
+                        help="Continue the chunked run writing to DIRECTORY from its last checkpoint, "
+                             "with the arguments it was started with")
+    parser.add_argument("--record", choices=['spikes', 'stats', 'all'], default='spikes',
+                        help="Save raw spikes, online spike statistics (firing rates, binned E/I and "
+                             "input-group rates, ISI mean and CV) without the spikes, or both")
+    parser.add_argument("--rate_bin", type=float, default=1.0,
+                        help="Bin width of the recorded population rates in ms")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print the wall time spent in each phase of the simulation step to stderr")
+    parser.add_argument("--integrator", choices=['euler', 'exact'], default='euler',
+                        help="Membrane integration: forward Euler, or exact between synaptic events with "
+                             "spike times placed within the step (for larger --dt)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Update the neurons in this many parallel blocks with the compiled numba "
+                             "backend (requires --connectivity_format sparse); spikes are unchanged")
     parser.add_argument("--mu_1", choices=['none', 'sine', 'bumps'], default='none',
                         help="Type of mu_1 input (none, sine, or bumps)")
     parser.add_argument("--mu_2", choices=['none', 'sine', 'bumps'], default='none',
                         help="Type of mu_2 input (none, sine, or bumps)")
 
-    args = parser.parse_args()
+    return parser
 
-    # Initialize network
-    net = BalancedSpikingNetwork(N=args.N, C=args.C, f=args.f, g=args.g,
+def build_network(args, connectivity=None, input_neurons=None, shared=None):
+    """Initialize the network described by parsed arguments, reusing prebuilt structures if given."""
+    from .network import BalancedSpikingNetwork
+    return BalancedSpikingNetwork(N=args.N, C=args.C, f=args.f, g=args.g,
                                  tau_m=args.tau_m, V_th_mean=args.V_th_mean, V_th_distribution = args.V_th_distribution,
                                  V_th_std=args.V_th_std, J_mean=args.J_mean,
                                  mu_zero=args.mu_zero, dt=args.dt,
-                                 session=args.session, trial=args.trial)
+                                 session=args.session, trial=args.trial,
+                                 connectivity_format=args.connectivity_format,
+                                 connectivity_method=args.connectivity_method,
+                                 dtype=args.dtype,
+                                 connectivity=connectivity, input_neurons=input_neurons,
+                                 shared=shared, cache=args.cache_dir)
 
+def make_inputs(args, net):
+    """Generate the mu_1 and mu_2 inputs requested by parsed arguments."""
+    from .inputs import SineInput, BumpsInput, generate_input_sine as gen_sine, generate_input_bumps as gen_bump
+    if args.input_method == 'lazy':
+        # Sources store only the waveform and generate their noise while the simulation runs
+        sine, bumps = SineInput, BumpsInput
+    else:
+        sine, bumps = gen_sine, gen_bump
 
-
-    # Generate mu_1 and mu_2 based on command-line arguments
     mu_1 = None
     mu_2 = None
 
     if args.mu_1 == 'sine':
-        mu_1 = gen_sine(net.rng_input, args.duration, len(net.input_neurons[0]), args.dt)
+        mu_1 = sine(net.rng_input, args.duration, len(net.input_neurons[0]), args.dt, dtype=args.dtype)
     elif args.mu_1 == 'bumps':
-        mu_1 = gen_bump(net.rng_input, args.duration, len(net.input_neurons[0]), args.dt)
+        mu_1 = bumps(net.rng_input, args.duration, len(net.input_neurons[0]), args.dt, dtype=args.dtype)
 
     if args.mu_2 == 'sine':
-        mu_2 = gen_sine(net.rng_input, args.duration, len(net.input_neurons[1]), args.dt)
+        mu_2 = sine(net.rng_input, args.duration, len(net.input_neurons[1]), args.dt, dtype=args.dtype)
     elif args.mu_2 == 'bumps':
-        mu_2 = gen_bump(net.rng_input, args.duration, len(net.input_neurons[1]), args.dt)
+        mu_2 = bumps(net.rng_input, args.duration, len(net.input_neurons[1]), args.dt, dtype=args.dtype)
+
+    return mu_1, mu_2
+
+def make_engine(args, net):
+    """Simulation engine for parsed arguments."""
+    from importlib.util import find_spec
+    from .simulation import SimulationEngine
+    if args.threads is None:
+        # The exact integrator visits the synapses of every spike in turn: compile it when
+        # numba is installed (both backends produce the same spikes)
+        backend = "numba" if args.integrator == "exact" and find_spec("numba") is not None else "numpy"
+        return SimulationEngine(net, backend=backend, profile=args.profile, integrator=args.integrator)
+    return SimulationEngine(net, backend="numba", threads=args.threads, profile=args.profile,
+                            integrator=args.integrator)
+
+def simulate(args, net):
+    """Run the simulation described by parsed arguments and return the data to save."""
+    from .recorders import default_recorders
+    # Generate mu_1 and mu_2 based on command-line arguments
+    mu_1, mu_2 = make_inputs(args, net)
 
     # Initialize simulation engine
-    engine = SimulationEngine(net)
+    engine = make_engine(args, net)
+
+    recorders = default_recorders(args.rate_bin) if args.record != 'spikes' else []
 
     # Run simulation
-    spikes = engine.run(args.duration, T_burn_in=args.burn_in, record_spikes=True, mu_1=mu_1, mu_2=mu_2)
+    spikes = engine.run(args.duration, T_burn_in=args.burn_in, record_spikes=args.record != 'stats',
+                        mu_1=mu_1, mu_2=mu_2, recorders=recorders)
 
     data_to_save = {"spikes":spikes,
                     "input_1_neurons":net.input_neurons[0],
                     "input_2_neurons":net.input_neurons[1],
                     "rng_check":net.rng[3].normal(0, 1, 3)}
+    if args.record == 'stats':
+        del data_to_save["spikes"]
+    for recorder in recorders:
+        data_to_save.update(recorder.results())
+    if engine.profile is not None:
+        print(engine.profile.report(), file=sys.stderr)
+
+    return data_to_save
+
+def simulate_chunked(args, net, directory, checkpoint=None):
+    """
+    Run the simulation described by parsed arguments in chunks, streaming spikes to `directory`.
+
+    With `args.checkpoint_interval`, the state of the run is saved to
+    `directory/checkpoint.npz` at that interval. Given a loaded `checkpoint`,
+    the run continues from it and produces the same output as an
+    uninterrupted run.
+    """
+    from .checkpoint import save_checkpoint, restore_checkpoint
+    from .recorders import default_recorders
+    from .recording import SpikeWriter
+    # Inputs are regenerated from the start of rng_input, exactly as in the original run
+    mu_1, mu_2 = make_inputs(args, net)
+    engine = make_engine(args, net)
+    checkpoint_file = os.path.join(directory, "checkpoint.npz")
+
+    if checkpoint is None:
+        writer = SpikeWriter(directory, args.dt, metadata=run_metadata(args))
+        writer.save_arrays(input_1_neurons=net.input_neurons[0], input_2_neurons=net.input_neurons[1])
+        start_step, T_burn_in = 0, args.burn_in
+    else:
+        restore_checkpoint(checkpoint, engine)
+        writer = SpikeWriter.reopen(directory, checkpoint["n_spikes"])
+        start_step, T_burn_in = checkpoint["step"], 0.0
+
+    on_chunk = None
+    if args.checkpoint_interval is not None:
+        interval_steps = max(int(round(args.checkpoint_interval / args.dt)), 1)
+        last_checkpoint = start_step
+
+        def on_chunk(step):
+            nonlocal last_checkpoint
+            if step - last_checkpoint >= interval_steps:
+                save_checkpoint(checkpoint_file, engine, step, writer, args=vars(args))
+                last_checkpoint = step
+
+    recorders = default_recorders(args.rate_bin) if args.record != 'spikes' else []
+    engine.run_chunked(args.duration, args.chunk, writer, T_burn_in=T_burn_in, mu_1=mu_1, mu_2=mu_2,
+                       start_step=start_step, on_chunk=on_chunk, recorders=recorders,
+                       record_spikes=args.record != 'stats')
+    writer.save_arrays(rng_check=net.rng[3].normal(0, 1, 3))
+    for recorder in recorders:
+        writer.save_arrays(**recorder.results())
+    if engine.profile is not None:
+        print(engine.profile.report(), file=sys.stderr)
+    return writer
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "sweep":
+        from .sweep import main as sweep_main
+        return sweep_main(argv[1:])
+    if argv and argv[0] == "bench":
+        from .bench import main as bench_main
+        return bench_main(argv[1:])
+    if argv and argv[0] in ("batch", "serve"):
+        from .batch import main as batch_main
+        return batch_main(argv)
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    checkpoint = None
+    if args.resume is not None:
+        from .checkpoint import load_checkpoint
+        checkpoint = load_checkpoint(os.path.join(args.resume, "checkpoint.npz"))
+        # Options added after the checkpoint was written take their defaults
+        merged = vars(parser.parse_args([]))
+        merged.update(checkpoint["args"])
+        merged.update(output=args.resume, resume=args.resume)
+        args = argparse.Namespace(**merged)
+    try:
+        check_arguments(args)
+    except ValueError as error:
+        parser.error(str(error))
+
+    # Initialize network
+    net = build_network(args)
+
+    # Run simulation and save results
+    run(args, net, checkpoint=checkpoint)
+
+def check_arguments(args):
+    """Raise ValueError for combinations of options that `bsn` does not support."""
+    if args.chunk is not None and args.format is not None:
+        raise ValueError("--format does not apply to --chunk, which writes a spike directory")
+    if args.checkpoint_interval is not None and args.chunk is None:
+        raise ValueError("--checkpoint_interval requires --chunk")
+    if args.threads is not None and args.connectivity_format != 'sparse':
+        raise ValueError("--threads requires --connectivity_format sparse")
+    if args.threads is not None and args.integrator != 'euler':
+        raise ValueError("--threads requires --integrator euler")
+    if args.checkpoint_interval is not None and args.record != 'spikes':
+        raise ValueError("--record stats/all cannot be checkpointed; record spikes and compute statistics from them")
+
+def run(args, net, checkpoint=None):
+    """
+    Simulate parsed arguments on `net` and write the output.
+
+    Returns:
+    str: Output file, or directory with `args.chunk`
+    """
+    if args.chunk is not None:
+        directory = args.output or "spikes"
+        simulate_chunked(args, net, directory, checkpoint=checkpoint)
+        return directory
+
+    filename = args.output or "spikes.npz"
+    save_results(args, simulate(args, net), filename)
+    return filename
+
+def output_format(args, filename):
+    """Output format requested by `--format`, or inferred from the file extension."""
+    if args.format is not None:
+        return args.format
+    return "pickle" if os.path.splitext(filename)[1] in (".pkl", ".pickle") else "npz"
+
+def run_metadata(args):
+    """Information stored alongside the spikes to identify and reproduce a run."""
+    from .network import SEED_ENTROPY
+    metadata = {name: value for name, value in vars(args).items()
+                if name not in ("output", "format", "cache_dir", "chunk", "checkpoint_interval", "resume",
+                                "profile", "threads")}
+    metadata["seed_entropy"] = SEED_ENTROPY
+    return metadata
 
-    # Save results
-    save_spikes(data_to_save, args.output)
+def save_results(args, data, filename):
+    """Save the data of a run in the output format selected by `args`."""
+    from .recording import save_spikes_npz
+    if output_format(args, filename) == "pickle":
+        save_spikes(data, filename)
+    else:
+        save_spikes_npz(data, filename, metadata=run_metadata(args))
 
 def save_spikes(spikes, filename):
-    """Save spike times to a pickle file."""
+    """Save spike data to a pickle file (legacy format, spikes as a list of (t, i) tuples)."""
+    from .recording import SpikeTrain
+    if isinstance(spikes, dict):
+        spikes = {key: value.to_list() if isinstance(value, SpikeTrain) else value
+                  for key, value in spikes.items()}
     with open(filename, 'wb') as f:
         pickle.dump(spikes, f)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
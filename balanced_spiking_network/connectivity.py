@@ -0,0 +1,117 @@
+import numpy as np
+
+
+class SparseConnectivity:
+    """
+    Fixed in-degree connectivity stored in compressed sparse row (CSR) form.
+
+    Row i lists the presynaptic partners of neuron i as int32 indices. No
+    per-synapse weights are stored: every excitatory synapse (presynaptic
+    index < N_E) carries `exc_weight` and every inhibitory one `inh_weight`.
+    An outgoing (transposed) index is built on first use so that spikes can
+    be propagated through the presynaptic columns that fired only.
+
+    The rows may cover a contiguous range of neurons only (e.g. those owned
+    by one rank of a distributed run, see distributed.py); row k then
+    belongs to the k-th neuron of that range, while presynaptic indices
+    stay global.
+
+    Attributes:
+    N (int): Total number of neurons
+    N_E (int): Number of excitatory neurons
+    indptr (numpy.ndarray): Row pointers, length n_rows + 1
+    indices (numpy.ndarray): Presynaptic indices (int32), length n_rows * C
+    exc_weight (float): Weight of excitatory synapses
+    inh_weight (float): Weight of inhibitory synapses
+    n_rows (int): Number of rows (postsynaptic neurons), N unless partial
+    """
+
+    def __init__(self, N, N_E, indptr, indices, exc_weight, inh_weight,
+                 out_indptr=None, out_indices=None):
+        self.N = N
+        self.n_rows = len(indptr) - 1
+        self.N_E = N_E
+        self.indptr = indptr
+        self.indices = indices
+        self.exc_weight = exc_weight
+        self.inh_weight = inh_weight
+        # Outgoing index, if already available (e.g. attached from shared memory)
+        self._out_indptr = out_indptr
+        self._out_indices = out_indices
+
+    @property
+    def shape(self):
+        return (self.n_rows, self.N)
+
+    @property
+    def nnz(self):
+        return int(self.indptr[-1])
+
+    @property
+    def nbytes(self):
+        """Memory held by the index arrays (including the outgoing index, if built)."""
+        nbytes = self.indptr.nbytes + self.indices.nbytes
+        if self._out_indices is not None:
+            nbytes += self._out_indptr.nbytes + self._out_indices.nbytes
+        return nbytes
+
+    def _build_outgoing(self):
+        """Build the transposed index: postsynaptic targets grouped by presynaptic neuron."""
+        post = np.repeat(np.arange(self.n_rows, dtype=np.int32), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind="stable")
+        self._out_indices = post[order]
+        self._out_indptr = np.zeros(self.N + 1, dtype=self.indptr.dtype)
+        np.cumsum(np.bincount(self.indices, minlength=self.N), out=self._out_indptr[1:])
+
+    def outgoing(self):
+        """Return (indptr, indices) of the postsynaptic targets grouped by presynaptic neuron."""
+        if self._out_indices is None:
+            self._build_outgoing()
+        return self._out_indptr, self._out_indices
+
+    def targets(self, neurons):
+        """Return the postsynaptic targets of `neurons`, one entry per synapse."""
+        if self._out_indices is None:
+            self._build_outgoing()
+        starts = self._out_indptr[neurons]
+        lengths = self._out_indptr[neurons + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=self._out_indices.dtype)
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        offsets += np.arange(total, dtype=offsets.dtype)
+        return self._out_indices[offsets]
+
+    def propagate(self, fired):
+        """
+        Summed synaptic weight received by every neuron from the `fired` neurons.
+
+        Equivalent to `W @ s` for a binary spike vector `s`, but only the
+        outgoing synapses of the neurons that fired are visited.
+
+        Parameters:
+        fired (numpy.ndarray): Indices of presynaptic neurons that spiked
+
+        Returns:
+        numpy.ndarray: Vector of summed synaptic weights, one per row
+        """
+        fired = np.asarray(fired)
+        exc = fired[fired < self.N_E]
+        inh = fired[fired >= self.N_E]
+        n_exc = np.bincount(self.targets(exc), minlength=self.n_rows)
+        n_inh = np.bincount(self.targets(inh), minlength=self.n_rows)
+        return self.exc_weight * n_exc + self.inh_weight * n_inh
+
+    def toarray(self):
+        """Return the equivalent dense weight matrix (NxN unless partial)."""
+        W = np.zeros(self.shape)
+        rows = np.repeat(np.arange(self.n_rows), np.diff(self.indptr))
+        W[rows, self.indices] = np.where(self.indices < self.N_E,
+                                         self.exc_weight, self.inh_weight)
+        return W
+
+    def to_scipy(self):
+        """Return the connectivity as a `scipy.sparse.csr_matrix` with explicit weights."""
+        from scipy.sparse import csr_matrix
+        data = np.where(self.indices < self.N_E, self.exc_weight, self.inh_weight)
+        return csr_matrix((data, self.indices, self.indptr), shape=self.shape)
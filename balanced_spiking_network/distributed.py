@@ -0,0 +1,389 @@
+import multiprocessing
+import time
+import warnings
+import numpy as np
+from .network import BalancedSpikingNetwork, NO_SPIKE
+from .recording import SpikeTrain
+from .simulation import _InputBlocks, _INPUT_BLOCK_STEPS, _euler_step
+from .utilities import create_sparse_connectivity_matrix
+
+
+def partition(N, size):
+    """Boundaries of the contiguous neuron ranges of `size` ranks: rank r owns [bounds[r], bounds[r + 1])."""
+    return np.linspace(0, N, size + 1).round().astype(np.int64)
+
+
+class ConnectionTransport:
+    """
+    Exchange of spike indices over a full mesh of `multiprocessing` connections.
+
+    The connections may be pipes between local processes (see `run_local`)
+    or TCP sockets between nodes (see `socket_transport`).
+
+    Parameters:
+    rank (int): Rank of this process
+    connections (dict): Maps every other rank to the Connection leading to it
+    """
+
+    def __init__(self, rank, connections):
+        self.rank = rank
+        self.size = len(connections) + 1
+        self.connections = connections
+
+    def allgather(self, array):
+        """Return the int32 arrays passed by all ranks, in rank order."""
+        array = np.ascontiguousarray(array, dtype=np.int32)
+        arrays = [None] * self.size
+        arrays[self.rank] = array
+        # Pairwise exchanges in rank order; the lower rank of each pair sends first
+        for peer in sorted(self.connections):
+            connection = self.connections[peer]
+            if self.rank < peer:
+                connection.send_bytes(array)
+                arrays[peer] = np.frombuffer(connection.recv_bytes(), dtype=np.int32)
+            else:
+                arrays[peer] = np.frombuffer(connection.recv_bytes(), dtype=np.int32)
+                connection.send_bytes(array)
+        return arrays
+
+    def close(self):
+        for connection in self.connections.values():
+            connection.close()
+
+
+def socket_transport(rank, addresses, authkey=b"bsn", timeout=60.0):
+    """
+    Connect `rank` to all other ranks over TCP.
+
+    Every rank listens on its own address and connects to the ranks below
+    it, so all processes can be started in any order.
+
+    Parameters:
+    rank (int): Rank of this process
+    addresses (list): (host, port) of every rank
+    authkey (bytes): Shared secret authenticating the connections
+    timeout (float): Seconds to wait for a lower rank to start listening
+
+    Returns:
+    ConnectionTransport: Transport over the connected sockets
+    """
+    from multiprocessing.connection import Listener, Client
+    listener = Listener(tuple(addresses[rank]), authkey=authkey)
+    connections = {}
+    try:
+        for peer in range(rank):
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    connection = Client(tuple(addresses[peer]), authkey=authkey)
+                    break
+                except ConnectionRefusedError:
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.1)
+            connection.send(rank)
+            connections[peer] = connection
+        for _ in range(rank + 1, len(addresses)):
+            connection = listener.accept()
+            connections[connection.recv()] = connection
+    finally:
+        listener.close()
+    return ConnectionTransport(rank, connections)
+
+
+class MPITransport:
+    """Exchange of spike indices over MPI (requires mpi4py)."""
+
+    def __init__(self, comm=None):
+        from mpi4py import MPI
+        self.comm = MPI.COMM_WORLD if comm is None else comm
+        self.rank = self.comm.Get_rank()
+        self.size = self.comm.Get_size()
+
+    def allgather(self, array):
+        """Return the int32 arrays passed by all ranks, in rank order."""
+        return self.comm.allgather(np.ascontiguousarray(array, dtype=np.int32))
+
+    def close(self):
+        pass
+
+
+class PartitionedNetwork(BalancedSpikingNetwork):
+    """
+    The share of one rank of a network distributed over `size` ranks.
+
+    The rank owns the contiguous neurons [start, stop) (see `partition`)
+    and builds only their rows of the sparse connectivity, with the
+    per-neuron seeded "rows" sampler, so every rank draws exactly the
+    connections that BalancedSpikingNetwork(..., connectivity_format="sparse",
+    connectivity_method="rows") has for its neurons. Connectivity memory is
+    thus split between ranks; per-neuron vectors (V, thresholds, ...) are
+    small in comparison and kept at full length N, with only the owned range
+    being simulated.
+
+    Parameters:
+    rank (int): Rank of this process
+    size (int): Number of ranks
+    kwargs: Network parameters, as for BalancedSpikingNetwork
+    """
+
+    def __init__(self, rank, size, **kwargs):
+        for name, value in (("connectivity_format", "sparse"), ("connectivity_method", "rows")):
+            if kwargs.setdefault(name, value) != value:
+                raise ValueError(f"Distributed networks require {name}='{value}'")
+        for name in ("connectivity", "shared", "cache"):
+            if kwargs.get(name) is not None:
+                raise ValueError(f"Distributed networks do not support {name}")
+        if not 0 <= rank < size:
+            raise ValueError(f"Invalid rank {rank} for {size} ranks")
+        self.rank = rank
+        self.size = size
+        bounds = partition(kwargs.get("N", 10000), size)
+        self.start, self.stop = int(bounds[rank]), int(bounds[rank + 1])
+        super().__init__(**kwargs)
+
+    def reset_state(self):
+        if self.connectivity is None:
+            self.connectivity = create_sparse_connectivity_matrix(
+                N=self.N, N_E=self.N_E, C_E=self.C_E, C_I=self.C_I, mean_weight=self.J_mean,
+                g=self.g, rng=self.rng[1], method="rows", rows=range(self.start, self.stop))
+        super().reset_state()
+
+
+class DistributedEngine:
+    """
+    Integrate the neurons of one rank, exchanging spikes with the other ranks.
+
+    Spikes emitted at step t are only needed delay_steps steps later, so the
+    ranks exchange the indices of their spikes once per window of delay_steps
+    steps (the minimum delay) and then deliver them to their own neurons.
+    The membrane update is the one of `SimulationEngine` (the shared numpy
+    step or the numba kernel) and delivery follows it operation by
+    operation, so the spikes of all ranks together are identical to a
+    single-process run of the same network with connectivity_method="rows".
+
+    Parameters:
+    network (PartitionedNetwork): Share of this rank
+    transport: ConnectionTransport or MPITransport connecting all ranks
+    delay (float): Synaptic delay in ms, rounded to a whole number of time
+        steps. Defaults to one time step; longer delays mean fewer exchanges.
+    backend (str): "numpy" or "numba", as for SimulationEngine
+    integrator (str): "euler"; the exact integrator of SimulationEngine
+        is not supported yet
+    """
+
+    def __init__(self, network, transport, delay=None, backend="numpy", integrator="euler"):
+        if transport.size != network.size:
+            raise ValueError(f"Network is split over {network.size} ranks, transport connects {transport.size}")
+        self.net = network
+        self.transport = transport
+        self.params = network.get_params()
+        self.dt = network.params.dt
+        self.delay_steps = 1 if delay is None else int(round(delay / self.dt))
+        if self.delay_steps < 1:
+            raise ValueError(f"Synaptic delay must be at least one time step ({self.dt} ms), got {delay}")
+        if backend not in ("numpy", "numba"):
+            raise ValueError(f"Invalid backend: {backend}. Use 'numpy' or 'numba'")
+        if integrator != "euler":
+            raise ValueError(f"DistributedEngine supports integrator='euler' only, got {integrator!r}")
+        self.integrator = integrator
+        # The kernels module imports numba, so it is only loaded for the numba backend
+        self._kernels = None
+        if backend == "numba":
+            from . import kernels
+            if kernels.HAVE_NUMBA:
+                self._kernels = kernels
+            else:
+                warnings.warn("numba is not installed, falling back to the numpy backend")
+                backend = "numpy"
+        self.backend = backend
+
+        # Ring buffer of synaptic input arriving at the neurons of this rank
+        self._pending = np.zeros((self.delay_steps, network.stop - network.start), dtype=network.dtype)
+        self._pending_pos = 0
+
+        # Input neurons owned by this rank, and their columns in the input blocks
+        self._inputs = []
+        for neurons in network.input_neurons:
+            owned = (neurons >= network.start) & (neurons < network.stop)
+            self._inputs.append((neurons[owned] - network.start, np.flatnonzero(owned)))
+
+    def run(self, T_sim, T_burn_in=0.0, record_spikes=False, mu_1=None, mu_2=None, recorders=None):
+        """
+        Execute the simulation loop with burn-in period on this rank.
+
+        All ranks must call `run` with the same arguments. Inputs are the
+        full inputs of the network, e.g. generated on every rank from
+        `net.rng_input` exactly as for a single-process run; each rank reads
+        the columns of its own input neurons.
+
+        Returns:
+        SpikeTrain: Spikes of the neurons of this rank (global indices)
+        """
+        if T_burn_in > 0:
+            self._simulate(T_burn_in, record_spikes=False)
+        for recorder in recorders or []:
+            recorder.start(self.net, self.dt, int(round(T_sim / self.dt)))
+        return self._simulate(T_sim, record_spikes=record_spikes, mu_1=_InputBlocks(mu_1),
+                              mu_2=_InputBlocks(mu_2), recorders=recorders)
+
+    def _exchange(self, window_steps, window_fired, first_pos):
+        """Gather the spikes of a window from all ranks and deposit them for their arrival."""
+        steps = np.repeat(np.arange(len(window_fired), dtype=np.int32), [fired.size for fired in window_fired])
+        local = np.concatenate([steps] + window_fired) if window_fired else np.empty(0, dtype=np.int32)
+        parts = self.transport.allgather(local)
+        gathered = [np.split(part, 2) for part in parts]
+        W = self.net.connectivity
+        for k in range(window_steps):
+            fired = np.concatenate([neurons[part_steps == k] for part_steps, neurons in gathered])
+            if fired.size == 0:
+                continue
+            pending = self._pending[(first_pos + k) % self.delay_steps]
+            if self.backend == "numba":
+                out_indptr, out_indices = W.outgoing()
+                self._kernels.deposit_spikes(pending, out_indptr, out_indices, fired, W.N_E,
+                                             W.exc_weight, W.inh_weight, self._n_exc, self._n_inh)
+            else:
+                pending += W.propagate(fired)
+
+    def _simulate(self, T_sim, record_spikes=False, mu_1=None, mu_2=None, recorders=None):
+        """Core simulation loop of this rank (private method)."""
+        net = self.net
+        start, stop = net.start, net.stop
+        spikes = SpikeTrain(self.dt)
+        # Views of the owned range; the full-length arrays are updated in place
+        V, last_spike, refractory = net.V[start:stop], net.last_spike[start:stop], net.refractory[start:stop]
+        V_th = net.V_th[start:stop]
+        params = self.params
+        n = stop - start
+
+        n_steps = int(round(T_sim / self.dt))
+        refractory_steps = int(np.floor(params.tau_r / self.dt + 1e-6))
+
+        synaptic_input = np.empty(n, dtype=net.dtype)
+        external_input = np.empty(n, dtype=net.dtype)
+        if self.backend == "numba":
+            fired_buffer = np.empty(n, dtype=np.intp)
+            self._n_exc = np.zeros(n, dtype=np.int64)
+            self._n_inh = np.zeros(n, dtype=np.int64)
+        else:
+            dV = np.empty(n, dtype=net.dtype)
+            is_refractory = np.empty(n, dtype=bool)
+            spiked = np.empty(n, dtype=bool)
+
+        # Spikes of the current exchange window (global indices, one array per step)
+        window_fired = []
+        window_pos = self._pending_pos
+
+        for step in range(n_steps):
+            pending = self._pending[self._pending_pos]
+            np.multiply(pending, params.tau_m, out=synaptic_input)
+            synaptic_input /= self.dt
+            pending[:] = 0
+
+            if step % _INPUT_BLOCK_STEPS == 0:
+                n_block = min(_INPUT_BLOCK_STEPS, n_steps - step)
+                block_1 = None if mu_1 is None else mu_1.read(step, n_block)
+                block_2 = None if mu_2 is None else mu_2.read(step, n_block)
+
+            external_input.fill(params.mu_zero)
+            for block, (neurons, columns) in zip((block_1, block_2), self._inputs):
+                if block is not None:
+                    external_input[neurons] += block[step % _INPUT_BLOCK_STEPS][columns]
+
+            if self.backend == "numba":
+                n_fired = self._kernels.lif_step(V, V_th, refractory, synaptic_input, external_input,
+                                                 params.E_L, params.V_r, params.tau_m, self.dt,
+                                                 refractory_steps, fired_buffer)
+                fired = fired_buffer[:n_fired]
+            else:
+                fired = _euler_step(V, V_th, refractory, synaptic_input, external_input, params.E_L, params.V_r,
+                                    params.tau_m, self.dt, refractory_steps, dV, is_refractory, spiked)
+
+            last_spike[fired] = step
+            fired = (fired + start).astype(np.int32)
+            window_fired.append(fired)
+            if fired.size > 0:
+                if record_spikes:
+                    spikes.append(step, fired)
+                for recorder in recorders or ():
+                    recorder.update(step, fired)
+            self._pending_pos = (self._pending_pos + 1) % self.delay_steps
+
+            # Spikes of the window arrive delay_steps steps after they were emitted,
+            # so exchanging them once at the end of the window is in time
+            if len(window_fired) == self.delay_steps or step == n_steps - 1:
+                self._exchange(len(window_fired), window_fired, window_pos)
+                window_fired = []
+                window_pos = self._pending_pos
+
+        np.subtract(last_spike, n_steps, out=last_spike, where=last_spike != NO_SPIKE)
+        return spikes
+
+
+def _run_rank(rank, size, connections, result, network_kwargs, inputs, run_kwargs, engine_kwargs):
+    """Process of one rank of `run_local`."""
+    transport = ConnectionTransport(rank, connections)
+    net = PartitionedNetwork(rank, size, **network_kwargs)
+    mu_1, mu_2 = (None, None) if inputs is None else inputs(net)
+    engine = DistributedEngine(net, transport, **engine_kwargs)
+    spikes = engine.run(mu_1=mu_1, mu_2=mu_2, record_spikes=True, **run_kwargs)
+    transport.close()
+    result.send((spikes.steps, spikes.neurons, net.params.dt))
+    result.close()
+
+
+def run_local(size, T_sim, T_burn_in=0.0, inputs=None, delay=None, backend="numpy", **network_kwargs):
+    """
+    Run a distributed simulation in `size` local processes connected by pipes.
+
+    Parameters:
+    size (int): Number of ranks (processes)
+    T_sim (float): Recording duration (ms)
+    T_burn_in (float): Burn-in duration without inputs or recording (ms)
+    inputs (callable): Called as inputs(net) in every rank to build its
+        (mu_1, mu_2), e.g. `functools.partial(cli.make_inputs, args)`; must
+        be picklable
+    delay (float): Synaptic delay in ms (the exchange window)
+    backend (str): "numpy" or "numba"
+    network_kwargs: Network parameters, as for BalancedSpikingNetwork
+
+    Returns:
+    SpikeTrain: Spikes of the whole network, ordered by time step and neuron
+        as returned by `SimulationEngine.run`
+    """
+    context = multiprocessing.get_context("spawn")
+    pipes = {(a, b): context.Pipe() for a in range(size) for b in range(a + 1, size)}
+    processes, results = [], []
+    for rank in range(size):
+        connections = {}
+        for (a, b), (end_a, end_b) in pipes.items():
+            if a == rank:
+                connections[b] = end_a
+            elif b == rank:
+                connections[a] = end_b
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_run_rank, args=(
+            rank, size, connections, sender, network_kwargs, inputs,
+            {"T_sim": T_sim, "T_burn_in": T_burn_in}, {"delay": delay, "backend": backend}))
+        process.start()
+        sender.close()
+        processes.append(process)
+        results.append(receiver)
+    for end_a, end_b in pipes.values():
+        end_a.close()
+        end_b.close()
+
+    try:
+        parts = [receiver.recv() for receiver in results]
+    except EOFError:
+        raise RuntimeError("A rank of the distributed run failed") from None
+    finally:
+        for process in processes:
+            process.join()
+
+    # Ranks own increasing neuron ranges, so a stable sort by step keeps neurons ascending
+    steps = np.concatenate([part[0] for part in parts])
+    neurons = np.concatenate([part[1] for part in parts])
+    order = np.argsort(steps, kind="stable")
+    return SpikeTrain.from_arrays(steps[order], neurons[order], parts[0][2])
@@ -1,6 +1,6 @@
 import numpy as np
 
-def generate_input_sine(rng, duration_ms, n_input_neurons, dt, amplitude=2, noise_std=0.2):
+def generate_input_sine(rng, duration_ms, n_input_neurons, dt, amplitude=2, noise_std=0.2, dtype=np.float64):
     """
     Generate sinusoidal current with Gaussian noise for input neurons.
 
@@ -9,6 +9,7 @@ def generate_input_sine(rng, duration_ms, n_input_neurons, dt, amplitude=2, nois
     input_neurons_dyn (numpy.ndarray): Array of neuron indices receiving dynamic input
     amplitude (float): Amplitude of the sine wave (default: 0.5)
     noise_std (float): Standard deviation of the Gaussian noise (default: 0.1)
+    dtype (numpy.dtype): Floating point type of the returned current
 
     Returns:
     numpy.ndarray: Normalized current for each input neuron
@@ -16,35 +17,54 @@ def generate_input_sine(rng, duration_ms, n_input_neurons, dt, amplitude=2, nois
     Global variables used:
     dt (float): Time step in milliseconds
     """
-    num_samples = int(duration_ms / dt)
-    time = np.arange(num_samples) * dt
+    current = sine_waveform(duration_ms, dt, amplitude)
 
-    # Generate base sine wave with a period of 400 ms
-    frequency = 2.5  # 2.5 Hz for 400 ms period
-    base_sine = amplitude * np.sin(2 * np.pi * frequency * time / 1000)
+     # Generate unique Gaussian noise for each neuron and add to sine wave
+    return _add_noise(rng, current, n_input_neurons, noise_std, dtype)
 
-    # Keep only the upper half of the sine wave
-    current = np.maximum(base_sine, 0)
 
-    # current = np.repeat(current.reshape(1,-1), n_input_neurons, axis=0)
+def _add_noise(rng, waveform, n_input_neurons, noise_std, dtype):
+    """(n_input_neurons x samples) waveform plus Gaussian noise, drawn row by row for float32 output."""
+    if np.dtype(dtype) == np.float64:
+        return waveform + rng.normal(0, noise_std, (n_input_neurons, waveform.size))
+    # Rows are drawn in the same order as the full matrix, without a float64 copy of it
+    current = np.empty((n_input_neurons, waveform.size), dtype=dtype)
+    for i in range(n_input_neurons):
+        current[i] = waveform + rng.normal(0, noise_std, waveform.size)
+    return current
 
-     # Generate unique Gaussian noise for each neuron and add to sine wave
-    current = current + rng.normal(0, noise_std, (n_input_neurons,num_samples))
 
 
-    return current
 
 
 
+def generate_input_bumps(rng, duration_ms, n_input_neurons, dt, noise_std=0.2, dtype=np.float64):
+    """
+    Generate a potential with two large bumps at the edges and a smaller, lower bump in the middle,
+    with Gaussian noise for each input neuron (see `bumps_waveform`).
+    """
+    V = bumps_waveform(duration_ms, dt)
+    return _add_noise(rng, V, n_input_neurons, noise_std, dtype)
+
+
+def sine_waveform(duration_ms, dt, amplitude=2):
+    """Upper half of a 2.5 Hz sine wave (400 ms period), one sample per time step."""
+    num_samples = int(duration_ms / dt)
+    time = np.arange(num_samples) * dt
+
+    # Generate base sine wave with a period of 400 ms
+    frequency = 2.5  # 2.5 Hz for 400 ms period
+    base_sine = amplitude * np.sin(2 * np.pi * frequency * time / 1000)
 
+    # Keep only the upper half of the sine wave
+    return np.maximum(base_sine, 0)
 
 
-def generate_input_bumps(rng, duration_ms, n_input_neurons, dt, noise_std=0.2):
+def bumps_waveform(duration_ms, dt):
     """
-    Generate a potential with two large bumps at the edges and a smaller, lower bump in the middle.
+    Two large bumps at the edges and a smaller, lower bump in the middle, one sample per time step.
 
-    Parameters:
-    x: array of x values
+    Shape parameters:
     a: controls the position of the bumps
     b: controls the width of the potential
     max_height: height of the outer peaks
@@ -75,8 +95,87 @@ def generate_input_bumps(rng, duration_ms, n_input_neurons, dt, noise_std=0.2):
     V *= max_height / np.max(V)
 
     # Ensure no negative values
-    V = np.maximum(V, 0)
+    return np.maximum(V, 0)
 
-    current = V + rng.normal(0, noise_std, (n_input_neurons, num_samples))
 
-    return current
+class InputSource:
+    """
+    Input current generated on the fly: a shared waveform plus Gaussian noise per neuron.
+
+    Only the waveform (one value per time step) is stored. Noise is drawn in
+    segments of `segment_steps` time steps, each from its own generator
+    seeded by the source seed and the segment number, so any block of time
+    steps is reproducible regardless of how the run is split into blocks. The
+    source seed is drawn from `rng` (usually the network's `rng_input`) when
+    the source is created.
+
+    Blocks are time-major: row s holds the current of all input neurons at
+    time step s, so the engine reads each step from contiguous memory.
+
+    Attributes:
+    waveform (numpy.ndarray): Deterministic current of every time step
+    n_inputs (int): Number of input neurons
+    noise_std (float): Standard deviation of the Gaussian noise
+    seed (int): Seed of the noise segments
+    dtype (numpy.dtype): Floating point type of the generated blocks
+    """
+
+    segment_steps = 1024
+
+    def __init__(self, rng, waveform, n_inputs, noise_std=0.2, dtype=np.float64):
+        self.waveform = waveform
+        self.n_inputs = n_inputs
+        self.noise_std = noise_std
+        self.dtype = np.dtype(dtype)
+        self.seed = int(rng.integers(2**63))
+        self._segment = (None, None)
+
+    @property
+    def n_steps(self):
+        return self.waveform.size
+
+    def _noise(self, j):
+        """Noise of segment j, shape (segment_steps, n_inputs)."""
+        if self._segment[0] != j:
+            rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(j,)))
+            noise = rng.normal(0, self.noise_std, (self.segment_steps, self.n_inputs))
+            self._segment = (j, noise.astype(self.dtype, copy=False))
+        return self._segment[1]
+
+    def block(self, start, n_steps):
+        """
+        Current of time steps `start` to `start + n_steps`.
+
+        Returns:
+        numpy.ndarray: C-contiguous (n_steps, n_inputs) array
+        """
+        if start < 0 or start + n_steps > self.n_steps:
+            raise ValueError(f"Time steps {start} to {start + n_steps} are outside the input "
+                             f"duration of {self.n_steps} steps")
+        current = np.empty((n_steps, self.n_inputs), dtype=self.dtype)
+        step = start
+        while step < start + n_steps:
+            j, offset = divmod(step, self.segment_steps)
+            n = min(self.segment_steps - offset, start + n_steps - step)
+            current[step - start:step - start + n] = self._noise(j)[offset:offset + n]
+            step += n
+        current += self.waveform[start:start + n_steps, None]
+        return current
+
+    def toarray(self):
+        """Materialize the full input as an (n_inputs x n_steps) array, as the generate_input_* functions return."""
+        return self.block(0, self.n_steps).T
+
+
+class SineInput(InputSource):
+    """Lazily generated counterpart of `generate_input_sine`."""
+
+    def __init__(self, rng, duration_ms, n_input_neurons, dt, amplitude=2, noise_std=0.2, dtype=np.float64):
+        super().__init__(rng, sine_waveform(duration_ms, dt, amplitude), n_input_neurons, noise_std, dtype)
+
+
+class BumpsInput(InputSource):
+    """Lazily generated counterpart of `generate_input_bumps`."""
+
+    def __init__(self, rng, duration_ms, n_input_neurons, dt, noise_std=0.2, dtype=np.float64):
+        super().__init__(rng, bumps_waveform(duration_ms, dt), n_input_neurons, noise_std, dtype)
@@ -0,0 +1,296 @@
+import contextlib
+import math
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional
+    njit = None
+    prange = range
+
+HAVE_NUMBA = njit is not None
+
+
+def _lif_step(V, V_th, refractory, synaptic_input, external_input,
+              E_L, V_r, tau_m, dt, refractory_steps, fired):
+    """
+    Advance all neurons by one time step in a single pass.
+
+    Fuses leak, input, threshold, reset and refractory handling. The
+    arithmetic follows the NumPy loop in `SimulationEngine._simulate`
+    operation by operation, so both produce the same spike trains.
+
+    Parameters:
+    V (numpy.ndarray): Membrane potentials, updated in place
+    V_th (numpy.ndarray): Threshold potentials
+    refractory (numpy.ndarray): Remaining refractory steps, updated in place
+    synaptic_input (numpy.ndarray): Synaptic input current for this step
+    external_input (numpy.ndarray): External input current for this step
+    fired (numpy.ndarray): Preallocated int array receiving the indices of
+        neurons that spiked
+
+    Returns:
+    int: Number of neurons that spiked (valid entries in `fired`)
+    """
+    n_fired = 0
+    for i in range(V.shape[0]):
+        if refractory[i] > 0:
+            V[i] = V_r
+            refractory[i] -= 1
+            continue
+        dV = (-(V[i] - E_L) + synaptic_input[i] + external_input[i]) / tau_m
+        V[i] += dV * dt
+        if V[i] >= V_th[i]:
+            V[i] = V_r
+            refractory[i] = refractory_steps
+            fired[n_fired] = i
+            n_fired += 1
+    return n_fired
+
+
+def _exact_step(V, V_th, last_spike, spike_offsets, step, synaptic_input, external_input,
+                E_L, V_r, tau_m, tau_r, dt, out_indptr, out_indices, out_weights, N_E,
+                exc_weight, inh_weight, arrivals, arrival_offsets, decay_start, fired, fired_offsets):
+    """
+    Advance all neurons by one time step with spikes placed within the step.
+
+    The spikes in `arrivals` reach the targets of their outgoing synapses at
+    `arrival_offsets` (ms after the start of the step, in ascending order).
+    Each target is first advanced to the arrival with the exact propagator
+    towards E_L + external_input, and fires at the interpolated time at
+    which it crosses its threshold on the way; otherwise the synaptic jump
+    is added and fires the neuron at the arrival if it reaches the
+    threshold. All neurons are then advanced to the end of the step in the
+    same way. Refractory periods end at `tau_r` after the spike offset, so
+    they need dt <= tau_r. The arithmetic follows `simulation._exact_step`
+    operation by operation.
+
+    Parameters:
+    last_spike (numpy.ndarray): Time step of the last spike, set in place
+    spike_offsets (numpy.ndarray): Offset of the last spike within its step
+        (ms), set in place
+    step (int): Current time step, on the scale of `last_spike`
+    synaptic_input (numpy.ndarray): Receives the synaptic input of the
+        step as a current, as for `_lif_step`
+    out_weights (numpy.ndarray): Weight of every outgoing synapse, or an
+        empty array for the population weights `exc_weight` (presynaptic
+        index < N_E) and `inh_weight`
+    decay_start (numpy.ndarray): exp(-t / tau_m) of the time t within the
+        step that V refers to; ones between steps
+    fired, fired_offsets (numpy.ndarray): Preallocated arrays receiving the
+        neurons that spiked and their offsets within the step
+
+    Returns:
+    int: Number of neurons that spiked (valid entries in `fired`)
+    """
+    synaptic_input[:] = 0
+    n_fired = 0
+    for e in range(arrivals.shape[0]):
+        j = arrivals[e]
+        s = arrival_offsets[e]
+        decay_s = math.exp(-s / tau_m)
+        weight = exc_weight if j < N_E else inh_weight
+        for k in range(out_indptr[j], out_indptr[j + 1]):
+            i = out_indices[k]
+            if out_weights.shape[0] > 0:
+                weight = out_weights[k]
+            synaptic_input[i] += weight
+            free = (last_spike[i] - step) * dt + spike_offsets[i] + tau_r
+            if free >= s:
+                continue  # Refractory: V stays at V_r and the input is lost
+            decay_0 = decay_start[i]
+            if free > 0:
+                # Released within the step: V relaxes from V_r from then on
+                decay_free = math.exp(-free / tau_m)
+                if decay_free < decay_0:
+                    decay_0 = decay_free
+            v_0 = V[i]
+            target = E_L + external_input[i]
+            v = target + (v_0 - target) * (decay_s / decay_0)
+            decay_start[i] = decay_s
+            if v >= V_th[i]:
+                # Crossed the threshold before the arrival
+                offset = -tau_m * math.log(decay_0)
+                if v_0 < V_th[i]:
+                    offset += tau_m * math.log((target - v_0) / (target - V_th[i]))
+                offset = min(offset, s)
+            else:
+                v += weight
+                if v < V_th[i]:
+                    V[i] = v
+                    continue
+                offset = s
+            V[i] = V_r
+            last_spike[i] = step
+            spike_offsets[i] = offset
+            fired[n_fired] = i
+            fired_offsets[n_fired] = offset
+            n_fired += 1
+
+    decay_dt = math.exp(-dt / tau_m)
+    for i in range(V.shape[0]):
+        synaptic_input[i] *= tau_m
+        synaptic_input[i] /= dt
+        decay_0 = decay_start[i]
+        decay_start[i] = 1.0
+        free = (last_spike[i] - step) * dt + spike_offsets[i] + tau_r
+        if free >= dt:
+            continue
+        if free > 0:
+            decay_free = math.exp(-free / tau_m)
+            if decay_free < decay_0:
+                decay_0 = decay_free
+        v_0 = V[i]
+        target = E_L + external_input[i]
+        v = target + (v_0 - target) * (decay_dt / decay_0)
+        if v < V_th[i]:
+            V[i] = v
+            continue
+        offset = -tau_m * math.log(decay_0)
+        if v_0 < V_th[i]:
+            offset += tau_m * math.log((target - v_0) / (target - V_th[i]))
+        offset = min(offset, dt)
+        V[i] = V_r
+        last_spike[i] = step
+        spike_offsets[i] = offset
+        fired[n_fired] = i
+        fired_offsets[n_fired] = offset
+        n_fired += 1
+    return n_fired
+
+
+def _deposit_spikes(pending, out_indptr, out_indices, fired, N_E,
+                    exc_weight, inh_weight, n_exc, n_inh):
+    """
+    Add the outgoing weights of the `fired` neurons to `pending`.
+
+    Synapses are counted per population first and weighted afterwards, as in
+    `SparseConnectivity.propagate`, so the summed input is bit-identical.
+    `n_exc` and `n_inh` are zeroed int scratch arrays and are zeroed again on
+    return.
+    """
+    for j in fired:
+        if j < N_E:
+            for k in range(out_indptr[j], out_indptr[j + 1]):
+                n_exc[out_indices[k]] += 1
+        else:
+            for k in range(out_indptr[j], out_indptr[j + 1]):
+                n_inh[out_indices[k]] += 1
+    for i in range(pending.shape[0]):
+        if n_exc[i] != 0 or n_inh[i] != 0:
+            pending[i] += exc_weight * n_exc[i] + inh_weight * n_inh[i]
+            n_exc[i] = 0
+            n_inh[i] = 0
+
+
+def _block_offsets(out_indptr, out_indices, bounds):
+    """
+    Split the outgoing synapses of every neuron by target block.
+
+    The targets of each presynaptic neuron are sorted, so those in block b
+    (rows bounds[b] to bounds[b + 1]) are the contiguous range
+    out_indices[offsets[b, j]:offsets[b + 1, j]].
+
+    Returns:
+    numpy.ndarray: (n_blocks + 1) x N offsets into `out_indices`
+    """
+    n_blocks = bounds.shape[0] - 1
+    N = out_indptr.shape[0] - 1
+    offsets = np.empty((n_blocks + 1, N), dtype=np.int64)
+    for j in prange(N):
+        start, stop = out_indptr[j], out_indptr[j + 1]
+        k = start
+        for b in range(n_blocks + 1):
+            while k < stop and out_indices[k] < bounds[b]:
+                k += 1
+            offsets[b, j] = k
+    return offsets
+
+
+def _threaded_step(bounds, offsets, out_indices, N_E, exc_weight, inh_weight,
+                   prev_fired, pending, deposit_slot, read_slot, update,
+                   V, V_th, refractory, synaptic_input, external_input,
+                   E_L, V_r, tau_m, dt, refractory_steps, fired, n_fired, n_exc, n_inh):
+    """
+    One time step with the neurons split into blocks processed in parallel.
+
+    Each block first adds the synapses from `prev_fired` (the spikes of the
+    previous step) onto its own rows of `pending[deposit_slot]`, then reads
+    and clears its rows of `pending[read_slot]` and updates its neurons as
+    `_lif_step` does. Blocks write only to their own rows, so the single
+    join at the end of the parallel loop is the only synchronization. The
+    indices of neurons that spiked in block b are written to
+    fired[bounds[b]:bounds[b] + n_fired[b]]. With `update` False only the
+    deposit is done (to deliver the spikes of the last step of a run).
+    """
+    n_blocks = bounds.shape[0] - 1
+    for b in prange(n_blocks):
+        lo, hi = bounds[b], bounds[b + 1]
+        for f in range(prev_fired.shape[0]):
+            j = prev_fired[f]
+            if j < N_E:
+                for k in range(offsets[b, j], offsets[b + 1, j]):
+                    n_exc[out_indices[k]] += 1
+            else:
+                for k in range(offsets[b, j], offsets[b + 1, j]):
+                    n_inh[out_indices[k]] += 1
+        for i in range(lo, hi):
+            if n_exc[i] != 0 or n_inh[i] != 0:
+                pending[deposit_slot, i] += exc_weight * n_exc[i] + inh_weight * n_inh[i]
+                n_exc[i] = 0
+                n_inh[i] = 0
+        if not update:
+            continue
+
+        n = 0
+        for i in range(lo, hi):
+            synaptic_input[i] = pending[read_slot, i] * tau_m
+            synaptic_input[i] /= dt
+            pending[read_slot, i] = 0
+            if refractory[i] > 0:
+                V[i] = V_r
+                refractory[i] -= 1
+                continue
+            dV = (-(V[i] - E_L) + synaptic_input[i] + external_input[i]) / tau_m
+            V[i] += dV * dt
+            if V[i] >= V_th[i]:
+                V[i] = V_r
+                refractory[i] = refractory_steps
+                fired[lo + n] = i
+                n += 1
+        n_fired[b] = n
+
+
+def _gather_fired(fired, n_fired, bounds, out):
+    """Collect the spikes of all blocks into `out` in ascending order and return their number."""
+    n = 0
+    for b in range(bounds.shape[0] - 1):
+        for k in range(n_fired[b]):
+            out[n] = fired[bounds[b] + k]
+            n += 1
+    return n
+
+
+@contextlib.contextmanager
+def thread_count(threads):
+    """
+    Run parallel kernels with `threads` worker threads (at most NUMBA_NUM_THREADS) within the block.
+
+    numba's thread count is a process-wide setting, so the previous count is
+    restored on exit.
+    """
+    import numba
+    previous = numba.get_num_threads()
+    numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+    try:
+        yield
+    finally:
+        numba.set_num_threads(previous)
+
+
+lif_step = njit(cache=True, nogil=True)(_lif_step) if HAVE_NUMBA else None
+exact_step = njit(cache=True, nogil=True, error_model="numpy")(_exact_step) if HAVE_NUMBA else None
+deposit_spikes = njit(cache=True, nogil=True)(_deposit_spikes) if HAVE_NUMBA else None
+block_offsets = njit(cache=True, nogil=True, parallel=True)(_block_offsets) if HAVE_NUMBA else None
+threaded_step = njit(cache=True, nogil=True, parallel=True)(_threaded_step) if HAVE_NUMBA else None
+gather_fired = njit(cache=True, nogil=True)(_gather_fired) if HAVE_NUMBA else None
@@ -1,10 +1,24 @@
+import os
 import numpy as np
+from .cache import NetworkCache
 from .parameters import NeuralParameters
+from .shared import SharedNetwork
 from .utilities import (
     generate_heterogeneous_thresholds as gen_thresholds,
     create_connectivity_matrix as create_conn_matrix,
+    create_sparse_connectivity_matrix as create_sparse_conn_matrix,
     select_input_neurons as select_inputs
 )
+
+# last_spike value of neurons that have not spiked yet
+NO_SPIKE = np.iinfo(np.int32).min
+
+# Entropy of the SeedSequence all random streams of a network are spawned from
+SEED_ENTROPY = 654321
+
+# Parameters that determine the connectivity and input neurons of a shared network
+SHARED_STRUCTURE_KEYS = ("N", "C", "f", "g", "J_mean", "session", "connectivity_method")
+
 class BalancedSpikingNetwork:
     """Main network class"""
 
@@ -15,7 +29,14 @@ class BalancedSpikingNetwork:
                  mu_zero = 15.1, # Added mu_zero to init
                  dt = 0.1, # Added dt to init
                  session = 0,
-                 trial = 0):
+                 trial = 0,
+                 connectivity_format = "dense",
+                 connectivity_method = "legacy",
+                 dtype = np.float64, # Floating point type of state, thresholds and dense weights
+                 connectivity = None, # Prebuilt connectivity of the same session, if any
+                 input_neurons = None, # Prebuilt (input_1_neurons, input_2_neurons), if any
+                 shared = None, # SharedNetwork handle to attach to, if any
+                 cache = None): # NetworkCache or cache directory, if any
 
         # Initialize parameters
         self.params = NeuralParameters()
@@ -30,6 +51,15 @@ class BalancedSpikingNetwork:
         self.J_mean = J_mean
         self.params.mu_zero = mu_zero #initializes it in the params here
         self.params.dt = dt #initializes dt in the params here
+        self.session = session
+        self.trial = trial
+        if connectivity_format not in ("dense", "sparse"):
+            raise ValueError(f"Invalid connectivity_format: {connectivity_format}. Use 'dense' or 'sparse'")
+        self.connectivity_format = connectivity_format
+        self.connectivity_method = connectivity_method # "legacy", vectorized "v2" or per-neuron seeded "rows"
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError(f"Invalid dtype: {dtype}. Use float32 or float64")
 
         # Derived parameters
         self.N_E = int(f * N)
@@ -37,9 +67,8 @@ class BalancedSpikingNetwork:
         self.C_I = C - self.C_E
 
         # Random state management
-        self.rng_init = np.random.default_rng(np.random.SeedSequence(entropy=654321, spawn_key=(0, session, 1, trial)))
-        self.rng = [np.random.default_rng(np.random.SeedSequence(entropy=654321, spawn_key=(0, session, 0, i))) for i in range(4)]
-        self.rng_input = np.random.default_rng(np.random.SeedSequence(entropy=654321, spawn_key=(0, session, 2, trial)))
+        self.rng_init, self.rng_input = self.trial_rngs(trial)
+        self.rng = [np.random.default_rng(np.random.SeedSequence(entropy=SEED_ENTROPY, spawn_key=(0, session, 0, i))) for i in range(4)]
         # rng_init for initial states different across trials and sessions
         # rng[0] is used for generating thresholds, rng[1] for connectivity,
         # rng[2] for ID of stimulated neurons, rng[3] for RNG check
@@ -50,37 +79,97 @@ class BalancedSpikingNetwork:
         self.V_th = None
         self.last_spike = None
         self.refractory = None
-        self.connectivity = None
-        self.input_neurons = None
+        self.connectivity = connectivity
+        self.input_neurons = input_neurons
+        self._shared_memory = None
+        if shared is not None:
+            self.attach(shared)
+
+        # Reuse structures generated by an earlier construction with the same parameters
+        self.cache = NetworkCache(cache) if isinstance(cache, (str, os.PathLike)) else cache
+        cached = None
+        if self.cache is not None and self.connectivity is None:
+            cached = self.cache.load(self)
+            if cached is not None:
+                self.V_th, self.connectivity, self.input_neurons = cached
 
         # Initialize network
         self.reset_state()
+        if self.cache is not None and cached is None:
+            self.cache.store(self)
 
-    def reset_state(self):
-        """Reset network to initial conditions"""
-        self.V = self.rng_init.uniform(self.params.V_r,
+    def trial_rngs(self, trial):
+        """Return fresh (rng_init, rng_input) generators of `trial` in this session."""
+        rng_init = np.random.default_rng(np.random.SeedSequence(entropy=SEED_ENTROPY, spawn_key=(0, self.session, 1, trial)))
+        rng_input = np.random.default_rng(np.random.SeedSequence(entropy=SEED_ENTROPY, spawn_key=(0, self.session, 2, trial)))
+        return rng_init, rng_input
+
+    def initial_potentials(self, rng_init):
+        """Draw initial membrane potentials uniformly between V_r and V_th_mean."""
+        # Drawn in float64 and rounded, so that both precisions start from the same potentials
+        return rng_init.uniform(self.params.V_r,
                                 self.V_th_mean,
-                                self.N)
-        self.V_th = gen_thresholds(
-            self.V_th_mean, self.V_th_std, self.N, self.rng[0], self.V_th_distribution # Used stored V_th_std
-        )
-        self.last_spike = np.full(self.N, -np.inf)
-        self.refractory = np.zeros(self.N, dtype=bool)
-        self.connectivity = create_conn_matrix(
-            N = self.N,
-            N_E = self.N_E,
-            C_E = self.C_E,
-            C_I = self.C_I,
-            mean_weight=self.J_mean,
-            g=self.g,
-            rng=self.rng[1]
-        )
-        self.input_neurons = select_inputs(
-            N = self.N,
-            N_E = self.N_E,
-            portion = 0.3,
-            overlap = 0.1,
-            rng = self.rng[2])
+                                self.N).astype(self.dtype, copy=False)
+
+    def share(self):
+        """
+        Publish connectivity, thresholds and input neurons in shared memory.
+
+        Returns:
+        SharedNetwork: Picklable handle for `BalancedSpikingNetwork(..., shared=handle)`.
+            Call `handle.unlink()` once no process uses the arrays anymore.
+        """
+        return SharedNetwork.publish(self)
+
+    def attach(self, shared):
+        """Use the read-only connectivity, thresholds and input neurons of a SharedNetwork."""
+        meta = shared.meta
+        mismatched = [f"{name}={meta.get(name)!r} (expected {getattr(self, name)!r})"
+                      for name in SHARED_STRUCTURE_KEYS if meta.get(name) != getattr(self, name)]
+        if mismatched:
+            raise ValueError(f"Shared network was built with different parameters: {', '.join(mismatched)}")
+        if np.dtype(meta["dtype"]) != self.dtype:
+            raise ValueError(f"Shared network has dtype {np.dtype(meta['dtype'])}; expected {self.dtype}")
+        self._shared_memory, arrays = shared.attach()
+        self.connectivity = shared.connectivity(arrays)
+        self.connectivity_format = meta["connectivity_format"]
+        self.input_neurons = (arrays["input_1_neurons"], arrays["input_2_neurons"])
+        # Thresholds are only reused if they were drawn with the same parameters
+        if meta["V_th"] == (self.V_th_mean, self.V_th_std, self.V_th_distribution):
+            self.V_th = arrays["V_th"]
+
+    def reset_state(self):
+        """Reset network to initial conditions (thresholds, connectivity and input neurons are built once)"""
+        self.V = self.initial_potentials(self.rng_init)
+        if self.V_th is None:
+            self.V_th = gen_thresholds(
+                self.V_th_mean, self.V_th_std, self.N, self.rng[0], self.V_th_distribution # Used stored V_th_std
+            ).astype(self.dtype, copy=False)
+        self.last_spike = np.full(self.N, NO_SPIKE, dtype=np.int32) # Time step of the last spike
+        self.refractory = np.zeros(self.N, dtype=np.int32) # Remaining refractory time steps
+        if self.connectivity is None:
+            kwargs = dict(
+                N = self.N,
+                N_E = self.N_E,
+                C_E = self.C_E,
+                C_I = self.C_I,
+                mean_weight=self.J_mean,
+                g=self.g,
+                rng=self.rng[1],
+                method=self.connectivity_method
+            )
+            if self.connectivity_format == "sparse":
+                # Weights are two scalars; only the int32 indices are stored per synapse
+                self.connectivity = create_sparse_conn_matrix(**kwargs)
+            else:
+                self.connectivity = create_conn_matrix(dtype=self.dtype, **kwargs)
+        if self.input_neurons is None:
+            self.input_neurons = select_inputs(
+                N = self.N,
+                N_E = self.N_E,
+                portion = 0.3,
+                overlap = 0.1,
+                rng = self.rng[2])
 
     def set_state(self, state):
         self.V, self.last_spike, self.refractory = state
@@ -0,0 +1,129 @@
+import time
+import tracemalloc
+import numpy as np
+
+
+class Profile:
+    """
+    Per-phase timing of the simulation loop, collected by `SimulationEngine(..., profile=True)`.
+
+    Each time step is split into phases whose wall time is accumulated:
+
+    - "synaptic": reading the synaptic input due (ring buffer or dense product)
+    - "input": constant and dynamic external input
+    - "update": membrane update, threshold, reset and refractory handling
+    - "propagate": last spike times and delivery of new spikes to their targets
+    - "record": spike recording, recorders and state monitors
+
+    With `threads`, reading and delivering synaptic input happen inside the
+    parallel kernel and are charged to "update".
+
+    With `memory=True`, allocations made during the simulation are traced
+    with `tracemalloc` (which slows the run down noticeably).
+
+    Attributes:
+    times (dict): Accumulated wall time per phase in seconds
+    steps (int): Number of time steps profiled
+    spikes (int): Number of spikes in those steps
+    max_spikes_per_step (int): Largest number of spikes in a single step
+    retained_blocks (int): Memory blocks allocated during the simulation
+        phases and not yet freed at their end (memory tracing only;
+        tracemalloc does not count blocks that were allocated and freed)
+    peak_allocated_bytes (int): Peak memory allocated above the level at the
+        start of a simulation phase (memory tracing only; on Python 3.8 the
+        peak since tracing started, if it was started by the caller)
+    """
+
+    PHASES = ("synaptic", "input", "update", "propagate", "record")
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.times = dict.fromkeys(self.PHASES, 0.0)
+        self.steps = 0
+        self.spikes = 0
+        self._spikes_squared = 0
+        self.max_spikes_per_step = 0
+        self.retained_blocks = 0 if memory else None
+        self.peak_allocated_bytes = 0 if memory else None
+        self._t = 0.0
+
+    def start_step(self):
+        self._t = time.perf_counter()
+
+    def lap(self, phase):
+        """Charge the time since the previous lap to `phase`."""
+        t = time.perf_counter()
+        self.times[phase] += t - self._t
+        self._t = t
+
+    def count(self, n_fired):
+        self.steps += 1
+        self.spikes += n_fired
+        self._spikes_squared += n_fired * n_fired
+        if n_fired > self.max_spikes_per_step:
+            self.max_spikes_per_step = n_fired
+
+    def start_phase(self):
+        """Begin tracing allocations of one simulation phase (memory profiling only)."""
+        if not self.memory:
+            return
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+            tracemalloc.reset_peak()
+        self._snapshot = tracemalloc.take_snapshot()
+        self._baseline = tracemalloc.get_traced_memory()[0]
+
+    def stop_phase(self):
+        if not self.memory:
+            return
+        peak = tracemalloc.get_traced_memory()[1] - self._baseline
+        self.peak_allocated_bytes = max(self.peak_allocated_bytes, peak)
+        differences = tracemalloc.take_snapshot().compare_to(self._snapshot, "filename")
+        self.retained_blocks += sum(max(stat.count_diff, 0) for stat in differences)
+        if self._started_tracing:
+            tracemalloc.stop()
+        self._snapshot = None
+
+    @property
+    def total(self):
+        """Wall time of all phases in seconds."""
+        return sum(self.times.values())
+
+    @property
+    def spikes_per_step(self):
+        """Mean and standard deviation of the number of spikes per step."""
+        if self.steps == 0:
+            return 0.0, 0.0
+        mean = self.spikes / self.steps
+        return mean, float(np.sqrt(max(self._spikes_squared / self.steps - mean**2, 0.0)))
+
+    def as_dict(self):
+        """Summary as a JSON-serializable dict."""
+        mean, std = self.spikes_per_step
+        return {"times": dict(self.times), "total_s": self.total, "steps": self.steps,
+                "spikes": self.spikes, "spikes_per_step_mean": mean, "spikes_per_step_std": std,
+                "max_spikes_per_step": self.max_spikes_per_step,
+                "retained_blocks": self.retained_blocks,
+                "peak_allocated_bytes": self.peak_allocated_bytes}
+
+    def report(self):
+        """Human-readable summary table."""
+        total = self.total
+        lines = [f"{'phase':<10} {'time (s)':>10} {'share':>7} {'per step (us)':>14}"]
+        for phase in self.PHASES:
+            t = self.times[phase]
+            lines.append(f"{phase:<10} {t:>10.3f} {100 * t / total if total else 0:>6.1f}% "
+                         f"{1e6 * t / self.steps if self.steps else 0:>14.2f}")
+        mean, std = self.spikes_per_step
+        lines.append(f"{'total':<10} {total:>10.3f}")
+        lines.append(f"{self.steps} steps, {self.spikes} spikes "
+                     f"({mean:.1f} +/- {std:.1f} per step, max {self.max_spikes_per_step})")
+        if self.memory:
+            lines.append(f"{self.retained_blocks} memory blocks still allocated, "
+                         f"peak {self.peak_allocated_bytes / 1024**2:.1f} MB allocated during simulation")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"Profile(steps={self.steps}, total={self.total:.3f}s)"
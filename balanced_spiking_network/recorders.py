@@ -0,0 +1,230 @@
+import os
+from abc import ABC, abstractmethod
+import numpy as np
+
+
+class Recorder(ABC):
+    """
+    Base class of online recorders updated inside the simulation loop.
+
+    Pass recorders to `SimulationEngine.run` (or `iter_chunks`/`run_chunked`).
+    `start` is called once before the recording period, and `update` at every
+    time step in which at least one neuron fired, with the indices of those
+    neurons in ascending order. Updates are vectorized over the fired
+    neurons and write into arrays allocated by `start`, so the cost per step
+    scales with the number of spikes and memory does not grow with the
+    duration (beyond one value per rate bin).
+    """
+
+    def start(self, net, dt, n_steps):
+        """
+        Allocate the accumulators for a recording period.
+
+        Parameters:
+        net (BalancedSpikingNetwork): Simulated network
+        dt (float): Time step (ms)
+        n_steps (int): Number of time steps of the recording period
+        """
+        self.dt = dt
+        self.n_steps = n_steps
+
+    @abstractmethod
+    def update(self, step, fired):
+        """Account for the neurons `fired` at time step `step` of the recording period."""
+
+    @abstractmethod
+    def results(self):
+        """Return the recorded statistics as a dict of arrays."""
+
+
+class SpikeCountRecorder(Recorder):
+    """Number of spikes and firing rate of every neuron."""
+
+    def start(self, net, dt, n_steps):
+        super().start(net, dt, n_steps)
+        self.counts = np.zeros(net.N, dtype=np.int64)
+
+    def update(self, step, fired):
+        self.counts[fired] += 1
+
+    @property
+    def rates(self):
+        """Firing rate of every neuron in Hz."""
+        return self.counts / (self.n_steps * self.dt / 1000)
+
+    def results(self):
+        return {"spike_counts": self.counts, "firing_rates": self.rates}
+
+
+class PopulationRateRecorder(Recorder):
+    """
+    Binned firing rate of groups of neurons.
+
+    Parameters:
+    bin_size (float): Bin width in ms, rounded to whole time steps
+    groups (dict): Maps group names to neuron indices; defaults to the
+        excitatory ("E") and inhibitory ("I") populations
+    """
+
+    def __init__(self, bin_size=1.0, groups=None):
+        self.bin_size = bin_size
+        self.groups = groups
+
+    def _groups(self, net):
+        if self.groups is not None:
+            return self.groups
+        return {"E": np.arange(net.N_E), "I": np.arange(net.N_E, net.N)}
+
+    def start(self, net, dt, n_steps):
+        super().start(net, dt, n_steps)
+        groups = self._groups(net)
+        self.names = list(groups)
+        self.bin_steps = max(int(round(self.bin_size / dt)), 1)
+        self.sizes = np.array([len(groups[name]) for name in self.names])
+        self.masks = np.zeros((len(groups), net.N), dtype=bool)
+        for g, name in enumerate(self.names):
+            self.masks[g, groups[name]] = True
+        self.counts = np.zeros((len(groups), -(-n_steps // self.bin_steps)), dtype=np.int64)
+
+    def update(self, step, fired):
+        self.counts[:, step // self.bin_steps] += np.count_nonzero(self.masks[:, fired], axis=1)
+
+    @property
+    def bin_edges(self):
+        """Bin edges in ms from the start of the recording period."""
+        return np.arange(self.counts.shape[1] + 1) * self.bin_steps * self.dt
+
+    @property
+    def rates(self):
+        """(groups x bins) mean firing rate per neuron in Hz."""
+        widths = np.diff(np.minimum(np.arange(self.counts.shape[1] + 1) * self.bin_steps, self.n_steps))
+        return self.counts / (np.maximum(self.sizes, 1)[:, None] * widths * self.dt / 1000)
+
+    def results(self):
+        rates = self.rates
+        results = {f"rate_{name}": rates[g] for g, name in enumerate(self.names)}
+        results["rate_bin_edges"] = self.bin_edges
+        return results
+
+
+class InputGroupRateRecorder(PopulationRateRecorder):
+    """Binned firing rate of the neurons receiving mu_1 ("input_1") and mu_2 ("input_2")."""
+
+    def _groups(self, net):
+        return {"input_1": net.input_neurons[0], "input_2": net.input_neurons[1]}
+
+
+class ISIRecorder(Recorder):
+    """
+    Running mean and variance of the inter-spike intervals of every neuron.
+
+    Moments are accumulated with Welford's update, so no spike times beyond
+    the last one of each neuron are kept.
+    """
+
+    def start(self, net, dt, n_steps):
+        super().start(net, dt, n_steps)
+        self.last_spike = np.full(net.N, -1, dtype=np.int64)
+        self.n = np.zeros(net.N, dtype=np.int64)
+        self.mean = np.zeros(net.N)
+        self.m2 = np.zeros(net.N)
+
+    def update(self, step, fired):
+        previous = self.last_spike[fired]
+        self.last_spike[fired] = step
+        i = fired[previous >= 0]
+        isi = (step - previous[previous >= 0]) * self.dt
+        self.n[i] += 1
+        delta = isi - self.mean[i]
+        self.mean[i] += delta / self.n[i]
+        self.m2[i] += delta * (isi - self.mean[i])
+
+    @property
+    def cv(self):
+        """Coefficient of variation of the ISIs of every neuron (NaN with fewer than two ISIs)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(self.m2 / self.n)
+            return np.where(self.n >= 2, std / self.mean, np.nan)
+
+    def results(self):
+        mean = np.where(self.n > 0, self.mean, np.nan)
+        return {"isi_count": self.n, "isi_mean": mean, "isi_cv": self.cv}
+
+
+def default_recorders(bin_size=1.0):
+    """Spike counts, E/I and input-group population rates, and ISI statistics."""
+    return [SpikeCountRecorder(), PopulationRateRecorder(bin_size),
+            InputGroupRateRecorder(bin_size), ISIRecorder()]
+
+
+class StateMonitor:
+    """
+    Samples of state variables of selected neurons at regular intervals.
+
+    Pass monitors as `monitors` to `SimulationEngine.run` (or
+    `iter_chunks`/`run_chunked`). After every time step the engine hands
+    over its in-place arrays; the monitor copies the requested neurons every
+    `stride` steps into a preallocated float32 buffer, so the overhead is
+    proportional to what is recorded. Variables are sampled at the end of
+    the step: `V` after threshold and reset, the inputs as applied in it.
+
+    Parameters:
+    variables (tuple): Any of "V", "synaptic_input" and "external_input"
+    neurons (array-like): Indices of the recorded neurons (default: all)
+    stride (int): Record every `stride`-th time step
+    directory (str): If given, the buffers are memory-mapped `.npy` files
+        `<directory>/<variable>.npy` instead of held in memory
+
+    Attributes:
+    data (dict): Maps each variable to its (n_samples x n_neurons) buffer
+    """
+
+    VARIABLES = ("V", "synaptic_input", "external_input")
+
+    def __init__(self, variables=("V",), neurons=None, stride=1, directory=None):
+        if isinstance(variables, str):
+            variables = (variables,)
+        unknown = set(variables) - set(self.VARIABLES)
+        if unknown:
+            raise ValueError(f"Unknown variable(s): {', '.join(sorted(unknown))}. "
+                             f"Use {', '.join(self.VARIABLES)}")
+        if stride < 1:
+            raise ValueError(f"stride must be at least 1, got {stride}")
+        self.variables = tuple(variables)
+        self.neurons = None if neurons is None else np.asarray(neurons, dtype=np.intp)
+        self.stride = stride
+        self.directory = directory
+
+    def start(self, net, dt, n_steps):
+        """Allocate one buffer per variable for a recording period of `n_steps` time steps."""
+        self.dt = dt
+        n_samples = -(-n_steps // self.stride)
+        n_neurons = net.N if self.neurons is None else self.neurons.size
+        self._index = slice(None) if self.neurons is None else self.neurons
+        self.data = {}
+        for name in self.variables:
+            if self.directory is None:
+                self.data[name] = np.zeros((n_samples, n_neurons), dtype=np.float32)
+            else:
+                os.makedirs(self.directory, exist_ok=True)
+                self.data[name] = np.lib.format.open_memmap(os.path.join(self.directory, name + ".npy"), mode="w+",
+                                                            dtype=np.float32, shape=(n_samples, n_neurons))
+
+    def update(self, step, state):
+        """Record time step `step` from `state`, which maps variable names to the engine's arrays."""
+        if step % self.stride:
+            return
+        row = step // self.stride
+        for name in self.variables:
+            self.data[name][row] = state[name][self._index]
+
+    @property
+    def times(self):
+        """Sample times in ms from the start of the recording period."""
+        n_samples = len(next(iter(self.data.values())))
+        return np.arange(n_samples) * self.stride * self.dt
+
+    def results(self):
+        results = {f"monitor_{name}": buffer for name, buffer in self.data.items()}
+        results["monitor_times"] = self.times
+        return results
@@ -0,0 +1,242 @@
+import json
+import os
+import pickle
+import numpy as np
+
+
+class SpikeTrain:
+    """
+    Spikes recorded as two growable int32 columns: time step and neuron index.
+
+    Iterating yields `(t, i)` tuples with t in ms, as the spike lists of
+    earlier releases did, but storage costs 8 bytes per spike.
+
+    Attributes:
+    dt (float): Time step (ms) used to convert steps to times
+    """
+
+    def __init__(self, dt, capacity=1024):
+        self.dt = dt
+        self._steps = np.empty(capacity, dtype=np.int32)
+        self._neurons = np.empty(capacity, dtype=np.int32)
+        self._size = 0
+
+    @classmethod
+    def from_arrays(cls, steps, neurons, dt):
+        """Wrap existing step and neuron columns (e.g. memory-mapped) without copying them."""
+        spikes = cls(dt, capacity=0)
+        spikes._steps = np.asarray(steps, dtype=np.int32)
+        spikes._neurons = np.asarray(neurons, dtype=np.int32)
+        spikes._size = len(spikes._steps)
+        return spikes
+
+    def append(self, step, neurons):
+        """Append the spikes of `neurons` at time step `step`."""
+        n = len(neurons)
+        if n == 0:
+            return
+        self._reserve(n)
+        self._steps[self._size:self._size + n] = step
+        self._neurons[self._size:self._size + n] = neurons
+        self._size += n
+
+    def append_many(self, steps, neurons):
+        """Append spikes given as matching arrays of steps and neuron indices."""
+        n = len(steps)
+        self._reserve(n)
+        self._steps[self._size:self._size + n] = steps
+        self._neurons[self._size:self._size + n] = neurons
+        self._size += n
+
+    def _reserve(self, n):
+        if self._size + n > self._steps.size:
+            capacity = max(2 * self._steps.size, self._size + n)
+            self._steps = np.resize(self._steps, capacity)
+            self._neurons = np.resize(self._neurons, capacity)
+
+    @property
+    def steps(self):
+        """Time step of each spike (int32)."""
+        return self._steps[:self._size]
+
+    @property
+    def neurons(self):
+        """Neuron index of each spike (int32)."""
+        return self._neurons[:self._size]
+
+    @property
+    def times(self):
+        """Time of each spike in ms."""
+        return self.steps * self.dt
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for step, i in zip(self.steps.tolist(), self.neurons.tolist()):
+            yield (step * self.dt, i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.to_list()[index]
+        step, i = int(self.steps[index]), int(self.neurons[index])
+        return (step * self.dt, i)
+
+    def __eq__(self, other):
+        if isinstance(other, SpikeTrain):
+            return (self.dt == other.dt and np.array_equal(self.steps, other.steps)
+                    and np.array_equal(self.neurons, other.neurons))
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+
+    def to_list(self):
+        """Return the spikes as a list of `(t, i)` tuples."""
+        return list(self)
+
+
+def save_spikes_npz(data, filename, metadata=None):
+    """
+    Save simulation results to a compressed `.npz` file.
+
+    SpikeTrain entries are stored as `<key>_steps` and `<key>_neurons` int32
+    columns plus `dt`; other entries are stored as arrays. `metadata` (e.g.
+    the run arguments) is stored as a JSON string.
+
+    Parameters:
+    data (dict): Results, e.g. as returned by `cli.simulate`
+    filename (str): Output file
+    metadata (dict): JSON-serializable run information
+    """
+    arrays = {}
+    for key, value in data.items():
+        if isinstance(value, SpikeTrain):
+            arrays[key + "_steps"] = value.steps
+            arrays[key + "_neurons"] = value.neurons
+            arrays["dt"] = value.dt
+        else:
+            arrays[key] = np.asarray(value)
+    if metadata is not None:
+        arrays["metadata"] = json.dumps(metadata)
+    # Write through a file object so that numpy does not append '.npz' to the name
+    with open(filename, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+class SpikeWriter:
+    """
+    Append-only spike output for chunked runs.
+
+    Spikes are appended to two raw int32 column files (`spike_steps.i32` and
+    `spike_neurons.i32`) in `directory` as each chunk completes, and
+    `metadata.json` is rewritten with the number of spikes written so far, so
+    the output of an interrupted run stays readable. Additional arrays (e.g.
+    input neurons) are stored as `.npy` files next to them.
+
+    Attributes:
+    directory (str): Output directory
+    dt (float): Time step (ms) of the recorded spikes
+    metadata (dict): JSON-serializable run information
+    n_spikes (int): Number of spikes written
+    """
+
+    def __init__(self, directory, dt, metadata=None):
+        self.directory = directory
+        self.dt = dt
+        self.metadata = {} if metadata is None else dict(metadata)
+        self.n_spikes = 0
+        os.makedirs(directory, exist_ok=True)
+        for name in ("spike_steps.i32", "spike_neurons.i32"):
+            open(os.path.join(directory, name), "wb").close()
+        self._write_metadata()
+
+    @classmethod
+    def reopen(cls, directory, n_spikes):
+        """
+        Continue writing to an existing spike directory after its first `n_spikes` spikes.
+
+        Spikes written after that point (e.g. by a run that was killed after
+        its last checkpoint) are discarded.
+        """
+        with open(os.path.join(directory, "metadata.json")) as f:
+            meta = json.load(f)
+        if n_spikes > meta["n_spikes"]:
+            raise ValueError(f"{directory} holds {meta['n_spikes']} spikes, cannot continue after {n_spikes}")
+        writer = cls.__new__(cls)
+        writer.directory = directory
+        writer.dt = meta["dt"]
+        writer.metadata = meta["metadata"]
+        writer.n_spikes = n_spikes
+        for name in ("spike_steps.i32", "spike_neurons.i32"):
+            os.truncate(os.path.join(directory, name), 4 * n_spikes)
+        writer._write_metadata()
+        return writer
+
+    def write(self, spikes):
+        """Append the spikes of one chunk."""
+        with open(os.path.join(self.directory, "spike_steps.i32"), "ab") as f:
+            spikes.steps.tofile(f)
+        with open(os.path.join(self.directory, "spike_neurons.i32"), "ab") as f:
+            spikes.neurons.tofile(f)
+        self.n_spikes += len(spikes)
+        self._write_metadata()
+
+    def save_arrays(self, **arrays):
+        """Store additional arrays next to the spikes."""
+        for name, value in arrays.items():
+            np.save(os.path.join(self.directory, name + ".npy"), np.asarray(value))
+
+    def _write_metadata(self):
+        meta = {"dt": self.dt, "n_spikes": self.n_spikes, "metadata": self.metadata}
+        path = os.path.join(self.directory, "metadata.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+
+def _load_spike_directory(directory):
+    with open(os.path.join(directory, "metadata.json")) as f:
+        meta = json.load(f)
+    n = meta["n_spikes"]
+
+    def column(name):
+        if n == 0:
+            return np.empty(0, dtype=np.int32)
+        return np.memmap(os.path.join(directory, name), dtype=np.int32, mode="r", shape=(n,))
+
+    data = {"spikes": SpikeTrain.from_arrays(column("spike_steps.i32"), column("spike_neurons.i32"), meta["dt"]),
+            "dt": meta["dt"],
+            "metadata": meta["metadata"]}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".npy"):
+            data[name[:-4]] = np.load(os.path.join(directory, name))
+    return data
+
+
+def load_spikes(filename):
+    """
+    Load results written by `bsn` in the `.npz`, chunked directory or legacy pickle format.
+
+    Returns:
+    dict: Results with spikes as a SpikeTrain (npz, directory) or a list of `(t, i)`
+        tuples (pickle), and the run metadata under "metadata" when available
+    """
+    if os.path.isdir(filename):
+        return _load_spike_directory(filename)
+    with open(filename, "rb") as f:
+        is_npz = f.read(4) == b"PK\x03\x04"
+    if not is_npz:
+        with open(filename, "rb") as f:
+            return pickle.load(f)
+
+    data = {}
+    with np.load(filename) as npz:
+        for key in npz.files:
+            if key.endswith("_neurons") and key[:-len("_neurons")] + "_steps" in npz.files:
+                name = key[:-len("_neurons")]
+                data[name] = SpikeTrain.from_arrays(npz[name + "_steps"], npz[key], float(npz["dt"]))
+            elif key == "metadata":
+                data[key] = json.loads(str(npz[key]))
+            elif not key.endswith("_steps"):
+                data[key] = npz[key]
+    return data
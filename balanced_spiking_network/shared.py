@@ -0,0 +1,149 @@
+import sys
+import numpy as np
+from multiprocessing import shared_memory
+from .connectivity import SparseConnectivity
+
+# Byte alignment of every array inside the shared block
+_ALIGN = 64
+
+# Blocks mapped by this process. numpy views do not pin the mapping, so blocks stay
+# mapped for the lifetime of the process (or until unlinked by their publisher)
+_blocks = {}
+
+
+def _attach_block(name):
+    """Attach to an existing shared memory block without taking ownership of it."""
+    if name in _blocks:
+        return _blocks[name]
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=name, track=False)
+        _blocks[name] = shm
+        return shm
+    # Before Python 3.13 attaching registers the block with the resource tracker,
+    # which would unlink it when this process exits although the publisher owns it
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+    _blocks[name] = shm
+    return shm
+
+
+class SharedNetwork:
+    """
+    Picklable handle to the static arrays of a network in one shared memory block.
+
+    The publishing process creates the block with `SharedNetwork.publish`
+    (or `BalancedSpikingNetwork.share`) and must keep the handle alive until
+    all users are done, then call `unlink`. Any process can pass the handle to
+    `BalancedSpikingNetwork(..., shared=handle)` to use the connectivity,
+    thresholds and input neurons zero-copy and read-only.
+
+    Attributes:
+    name (str): Name of the shared memory block
+    layout (dict): Maps array names to (offset, shape, dtype)
+    meta (dict): Connectivity format, weights and the parameters the arrays were built from
+    """
+
+    def __init__(self, name, layout, meta):
+        self.name = name
+        self.layout = layout
+        self.meta = meta
+        self._owner = False
+
+    @classmethod
+    def publish(cls, net):
+        """Copy the connectivity, thresholds and input neurons of `net` into a new shared block."""
+        arrays = {
+            "V_th": net.V_th,
+            "input_1_neurons": net.input_neurons[0],
+            "input_2_neurons": net.input_neurons[1],
+        }
+        W = net.connectivity
+        if isinstance(W, SparseConnectivity):
+            out_indptr, out_indices = W.outgoing()
+            arrays.update(indptr=W.indptr, indices=W.indices,
+                          out_indptr=out_indptr, out_indices=out_indices)
+            weights = (W.exc_weight, W.inh_weight)
+        else:
+            arrays["W"] = W
+            weights = None
+
+        layout = {}
+        size = 0
+        for key, array in arrays.items():
+            array = np.asarray(array)
+            layout[key] = (size, array.shape, array.dtype.str)
+            size += -(-array.nbytes // _ALIGN) * _ALIGN
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for key, array in arrays.items():
+            offset, shape, dtype = layout[key]
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = array
+
+        meta = {
+            "connectivity_format": "sparse" if weights is not None else "dense",
+            "weights": weights,
+            "N": net.N,
+            "N_E": net.N_E,
+            "C": net.C,
+            "f": net.f,
+            "g": net.g,
+            "J_mean": net.J_mean,
+            "session": net.session,
+            "connectivity_method": net.connectivity_method,
+            "dtype": net.dtype.str,
+            "V_th": (net.V_th_mean, net.V_th_std, net.V_th_distribution),
+        }
+        _blocks[shm.name] = shm
+        handle = cls(shm.name, layout, meta)
+        handle._owner = True
+        return handle
+
+    def attach(self):
+        """
+        Map the shared arrays into this process.
+
+        Returns:
+        tuple: (shared_memory.SharedMemory, dict of read-only numpy arrays)
+        """
+        shm = _attach_block(self.name)
+        arrays = {}
+        for key, (offset, shape, dtype) in self.layout.items():
+            array = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            array.flags.writeable = False
+            arrays[key] = array
+        return shm, arrays
+
+    def connectivity(self, arrays):
+        """Build the connectivity object from attached arrays."""
+        if self.meta["connectivity_format"] == "dense":
+            return arrays["W"]
+        exc_weight, inh_weight = self.meta["weights"]
+        return SparseConnectivity(self.meta["N"], self.meta["N_E"],
+                                  arrays["indptr"], arrays["indices"],
+                                  exc_weight, inh_weight,
+                                  out_indptr=arrays["out_indptr"],
+                                  out_indices=arrays["out_indices"])
+
+    def unlink(self):
+        """
+        Release the block (publisher only).
+
+        The block is unmapped from this process, so networks attached to it
+        here must no longer be used. Other processes keep their mapping until
+        they exit.
+        """
+        if self._owner:
+            shm = _blocks.pop(self.name)
+            shm.unlink()
+            shm.close()
+            self._owner = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_owner"] = False
+        return state
@@ -1,64 +1,791 @@
+import math
+import warnings
 import numpy as np
+from .connectivity import SparseConnectivity
+from .network import NO_SPIKE
+from .recording import SpikeTrain
+from .profiling import Profile
+
+
+def propagate(W, fired):
+    """
+    Summed synaptic weight received by every neuron from the `fired` neurons.
+
+    Only the columns of the presynaptic neurons that fired are visited, so the
+    cost scales with the number of spikes rather than with N^2.
+
+    Parameters:
+    W (numpy.ndarray or SparseConnectivity): Connectivity matrix
+    fired (numpy.ndarray): Indices of presynaptic neurons that spiked
+
+    Returns:
+    numpy.ndarray: Length-N vector of summed synaptic weights
+    """
+    if isinstance(W, SparseConnectivity):
+        return W.propagate(fired)
+    return W[:, fired].sum(axis=1)
+
+
+def _euler_step(V, V_th, refractory, synaptic_input, external_input, E_L, V_r, tau_m, dt, refractory_steps,
+                dV, is_refractory, spiked):
+    """
+    Advance all neurons by one forward Euler step with threshold, reset and refractory handling.
+
+    The numpy counterpart of `kernels.lif_step`, shared by `SimulationEngine`
+    and `distributed.DistributedEngine`. State arrays may be N or K x N;
+    `dV`, `is_refractory` and `spiked` are preallocated buffers of the same
+    shape, and on return `spiked` marks the neurons that fired.
+
+    Returns:
+    numpy.ndarray: Flat indices of the neurons that fired, in ascending order
+    """
+    np.greater(refractory, 0, out=is_refractory)
+
+    # Refractory neurons are clamped to V_r below, so their update is discarded
+    # dV = (-(V - E_L) + synaptic_input + external_input) / tau_m
+    np.subtract(V, E_L, out=dV)
+    np.negative(dV, out=dV)
+    dV += synaptic_input
+    dV += external_input
+    dV /= tau_m
+    dV *= dt
+    V += dV
+
+    np.greater_equal(V, V_th, out=spiked)
+    spiked &= ~is_refractory
+    fired = np.flatnonzero(spiked)
+    np.put(V, fired, V_r)
+    V[is_refractory] = V_r
+    refractory -= is_refractory
+    np.put(refractory, fired, refractory_steps)
+    return fired
+
+
+def _release(decay_0, free, tau_m):
+    """Start the relaxation of neurons released from refractoriness at `free` > 0 from then on (in place)."""
+    for k in np.flatnonzero(free > 0):
+        decay_free = math.exp(-free[k] / tau_m)
+        if decay_free < decay_0[k]:
+            decay_0[k] = decay_free
+
+
+def _crossing_offsets(crossed, decay_0, v_0, target, V_th, tau_m, limit):
+    """Interpolated times of the threshold crossings of the `crossed` neurons."""
+    offsets = []
+    for k in np.flatnonzero(crossed):
+        offset = -tau_m * math.log(decay_0[k])
+        if v_0[k] < V_th[k]:
+            offset += tau_m * math.log((target[k] - v_0[k]) / (target[k] - V_th[k]))
+        offsets.append(min(offset, limit))
+    return np.array(offsets, dtype=np.float64)
+
+
+def _exact_step(V, V_th, last_spike, spike_offsets, step, synaptic_input, external_input,
+                E_L, V_r, tau_m, tau_r, dt, out_indptr, out_indices, out_weights, N_E,
+                exc_weight, inh_weight, arrivals, arrival_offsets, decay_start, fired, fired_offsets):
+    """
+    NumPy counterpart of `kernels.exact_step`, with the same parameters.
+
+    Arriving spikes are handled one after another, each vectorized over its
+    targets, which are distinct; the arithmetic and the order of the fired
+    neurons follow the kernel, so both backends produce the same spikes.
+    """
+    synaptic_input[:] = 0
+    target = E_L + external_input
+    # End of the refractory period of every neuron, relative to the start of the step
+    free = (last_spike.astype(np.int64) - step) * dt + spike_offsets + tau_r
+    n_fired = 0
+
+    def record(neurons, offsets):
+        nonlocal n_fired
+        last_spike[neurons] = step
+        spike_offsets[neurons] = offsets
+        free[neurons] = offsets + tau_r
+        fired[n_fired:n_fired + neurons.size] = neurons
+        fired_offsets[n_fired:n_fired + neurons.size] = offsets
+        n_fired += neurons.size
+
+    for j, s in zip(arrivals.tolist(), arrival_offsets.tolist()):
+        decay_s = math.exp(-s / tau_m)
+        synapses = slice(out_indptr[j], out_indptr[j + 1])
+        targets = out_indices[synapses]
+        weights = out_weights[synapses] if out_weights.size else exc_weight if j < N_E else inh_weight
+        synaptic_input[targets] += weights
+        active = free[targets] < s
+        if not active.all():
+            # Refractory targets stay at V_r and lose the input
+            targets = targets[active]
+            if out_weights.size:
+                weights = weights[active]
+
+        decay_0 = decay_start[targets]
+        _release(decay_0, free[targets], tau_m)
+        v_0 = V[targets]
+        v = target[targets] + (v_0 - target[targets]) * (decay_s / decay_0)
+        decay_start[targets] = decay_s
+        threshold = V_th[targets]
+        crossed = v >= threshold
+        v += weights
+        spiking = (v >= threshold) | crossed
+        if spiking.any():
+            offsets = np.full(targets.size, s)
+            offsets[crossed] = _crossing_offsets(crossed, decay_0, v_0, target[targets], threshold, tau_m, s)
+            v[spiking] = V_r
+            record(targets[spiking], offsets[spiking])
+        V[targets] = v
+
+    synaptic_input *= tau_m
+    synaptic_input /= dt
+    neurons = np.flatnonzero(free < dt)
+    decay_0 = decay_start[neurons]
+    decay_start[:] = 1.0
+    _release(decay_0, free[neurons], tau_m)
+    v_0 = V[neurons]
+    target = target[neurons]
+    v = target + (v_0 - target) * (math.exp(-dt / tau_m) / decay_0)
+    threshold = V_th[neurons]
+    spiking = v >= threshold
+    if spiking.any():
+        offsets = _crossing_offsets(spiking, decay_0, v_0, target, threshold, tau_m, dt)
+        v[spiking] = V_r
+        record(neurons[spiking], offsets)
+    V[neurons] = v
+    return n_fired
+
+
+# Time steps of input requested from an input at a time
+_INPUT_BLOCK_STEPS = 1024
+
+
+class _InputBlocks:
+    """
+    Serve consecutive time-major blocks of an input.
+
+    The input may be an (n_inputs x n_steps) array, an input source with a
+    `block(start_step, n_steps)` method (see `inputs.InputSource`), a
+    callable `mu(start_step, n_steps)` returning an (n_inputs x n_steps)
+    block, or an iterator of consecutive (n_inputs x any) blocks.
+    """
+
+    def __init__(self, mu):
+        self.mu = mu
+        self._iterator = None
+        if mu is not None and not isinstance(mu, np.ndarray) and not hasattr(mu, "block") and not callable(mu):
+            self._iterator = iter(mu)
+            self._buffer = None
+
+    def read(self, start, n_steps):
+        """Return the C-contiguous (n_steps x n_inputs) block starting at time step `start`."""
+        if self.mu is None:
+            return None
+        if isinstance(self.mu, np.ndarray):
+            return np.ascontiguousarray(self.mu[:, start:start + n_steps].T)
+        if hasattr(self.mu, "block"):
+            return self.mu.block(start, n_steps)
+        if self._iterator is None:
+            return np.ascontiguousarray(np.asarray(self.mu(start, n_steps)).T)
+
+        # Blocks are read in order; collect them until this one is covered
+        blocks = [] if self._buffer is None else [self._buffer]
+        available = sum(block.shape[1] for block in blocks)
+        while available < n_steps:
+            try:
+                block = np.asarray(next(self._iterator))
+            except StopIteration:
+                raise ValueError(f"Input ended before time step {start + n_steps}") from None
+            blocks.append(block)
+            available += block.shape[1]
+        block = blocks[0] if len(blocks) == 1 else np.concatenate(blocks, axis=1)
+        self._buffer = block[:, n_steps:] if available > n_steps else None
+        return np.ascontiguousarray(block[:, :n_steps].T)
+
 
 class SimulationEngine:
-    """Handle numerical integration"""
+    """
+    Handle numerical integration
+
+    All state and per-step buffers use the floating point type of the
+    network (`BalancedSpikingNetwork(..., dtype=np.float32)` halves memory
+    and bandwidth). float32 runs diverge from float64 runs spike by spike
+    after a few ms, as any rounding change does in a chaotic network, but
+    preserve the spike statistics; see the README for the tolerance check.
+    """
 
-    def __init__(self, network):
+    def __init__(self, network, propagation=None, delay=None, backend="numpy", profile=False, threads=None,
+                 integrator="euler"):
+        """
+        Parameters:
+        network (BalancedSpikingNetwork): Network to integrate
+        propagation (str): "dense" (full matrix-vector product every step) or
+            "event" (only the outgoing synapses of neurons that fired are added
+            into a ring buffer of pending synaptic input). Defaults to "event"
+            for sparse connectivity and "dense" otherwise.
+        delay (float): Synaptic delay in ms, rounded to a whole number of time
+            steps (event propagation only). Defaults to one time step.
+        backend (str): "numpy" or "numba". The numba backend runs the membrane
+            update, threshold, reset and refractory handling as one compiled
+            pass; it falls back to "numpy" with a warning if numba is not
+            installed.
+        profile (bool or str): Accumulate the wall time of each phase of the
+            time step, step and spike counts in `self.profile` (see
+            profiling.Profile); "memory" also traces allocations. Off by
+            default, when the loop only checks that the profile is None.
+        threads (int): Split the neurons into this many contiguous blocks
+            that are updated in parallel by numba worker threads (numba
+            backend with sparse connectivity only). Each block delivers the
+            spikes of the previous step to its own neurons, then updates
+            them, so the threads synchronize once per step and the spike
+            trains are identical to the single-threaded run. The number of
+            threads running at once is capped by NUMBA_NUM_THREADS (the
+            number of cores by default).
+        integrator (str): "euler" (forward Euler, the default) or "exact".
+            The exact integrator places spikes within the time step: V is
+            advanced in closed form (towards E_L + external input, which is
+            constant over a step) from one synaptic arrival to the next, a
+            neuron fires at the interpolated time at which it crosses its
+            threshold, and its spike reaches the targets exactly one delay
+            later, within their step. Refractory periods are measured from
+            the spike time. Spike statistics then barely depend on dt (see
+            the README), at a higher cost per synaptic event than Euler. It
+            requires dt <= tau_r and is not available with `threads`,
+            `run_batch` or DistributedEngine. Spikes are still recorded at
+            the step in which they occur.
+        """
         self.net = network
         self.params = network.get_params()
         self.dt = network.params.dt
 
-    def run(self, T_sim, T_burn_in=0.0, record_spikes=False, mu_1=None, mu_2=None):
-        """Execute simulation loop with burn-in period."""
+        if propagation is None:
+            propagation = "event" if isinstance(network.connectivity, SparseConnectivity) else "dense"
+        if propagation not in ("dense", "event"):
+            raise ValueError(f"Invalid propagation: {propagation}. Use 'dense' or 'event'")
+        if propagation == "dense" and isinstance(network.connectivity, SparseConnectivity):
+            raise ValueError("Sparse connectivity requires propagation='event'")
+        self.propagation = propagation
+
+        self.delay_steps = 1 if delay is None else int(round(delay / self.dt))
+        if self.delay_steps < 1:
+            raise ValueError(f"Synaptic delay must be at least one time step ({self.dt} ms), got {delay}")
+        if propagation == "dense" and self.delay_steps != 1:
+            raise ValueError("Synaptic delays longer than one time step require propagation='event'")
+
+        if backend not in ("numpy", "numba"):
+            raise ValueError(f"Invalid backend: {backend}. Use 'numpy' or 'numba'")
+        if integrator not in ("euler", "exact"):
+            raise ValueError(f"Invalid integrator: {integrator}. Use 'euler' or 'exact'")
+        if integrator == "exact" and self.dt > self.params.tau_r:
+            raise ValueError(f"integrator='exact' requires dt <= tau_r ({self.params.tau_r} ms), got {self.dt}")
+        self.integrator = integrator
+
+        if threads is not None:
+            if integrator != "euler":
+                raise ValueError("threads requires integrator='euler'")
+            if threads < 1:
+                raise ValueError(f"threads must be at least 1, got {threads}")
+            if backend != "numba":
+                raise ValueError("threads requires backend='numba'")
+            if not isinstance(network.connectivity, SparseConnectivity):
+                raise ValueError("threads requires sparse connectivity")
+        # The kernels module imports numba, so it is only loaded for the numba backend
+        self._kernels = None
+        if backend == "numba":
+            from . import kernels
+            if kernels.HAVE_NUMBA:
+                self._kernels = kernels
+            else:
+                warnings.warn("numba is not installed, falling back to the numpy backend")
+                backend = "numpy"
+        self.backend = backend
+
+        # Without numba the run falls back to the single-threaded numpy backend
+        self.threads = threads if backend == "numba" else None
+        # Neuron block boundaries and per-block outgoing synapse offsets, built on first use
+        self._blocks = None
+
+        if profile not in (False, True, "memory"):
+            raise ValueError(f"Invalid profile: {profile}. Use False, True or 'memory'")
+        self.profile = Profile(memory=profile == "memory") if profile else None
+
+        # Ring buffer of summed synaptic weights arriving in the coming delay_steps steps
+        self._pending = None
+        self._pending_pos = 0
+        # Exact integrator: ring buffer of the spikes arriving in the coming delay_steps
+        # steps (neurons, offsets within the step and counts) and the offsets of the
+        # last spike of every neuron; the outgoing synapses are built on first use
+        self._arrivals = None
+        self._spike_offsets = None
+        self._outgoing = None
+
+    def reset(self):
+        """Discard synaptic input that is still in transit."""
+        self._pending = None
+        self._pending_pos = 0
+        self._arrivals = None
+        self._spike_offsets = None
+
+    def run(self, T_sim, T_burn_in=0.0, record_spikes=False, mu_1=None, mu_2=None, recorders=None,
+            monitors=None):
+        """
+        Execute simulation loop with burn-in period.
+
+        `mu_1` and `mu_2` are (n_inputs x n_steps) arrays or input sources
+        such as `inputs.SineInput`, which generate their current block by
+        block instead of holding it in memory. `recorders` (see recorders.py)
+        accumulate spike statistics during the recording period, e.g. with
+        record_spikes=False when the raw spikes are not needed, and
+        `monitors` (e.g. `recorders.StateMonitor`) sample state variables.
+
+        Returns:
+        SpikeTrain: Spikes of the recording period (time steps and neuron
+            indices; iterates as `(t, i)` tuples like the former spike lists)
+        """
 
         # **1. Burn-in Period (Transient State Removal)**
         if T_burn_in > 0:
             self._simulate(T_burn_in, record_spikes=False, mu_1=None, mu_2=None)  # No recording during burn-in
         # **2. Recording Period**
-        final_state, spikes = self._simulate(T_sim, record_spikes=record_spikes, mu_1=mu_1, mu_2=mu_2) #simulation call returns
+        for recorder in [*(recorders or ()), *(monitors or ())]:
+            recorder.start(self.net, self.dt, int(round(T_sim / self.dt)))
+        final_state, spikes = self._simulate(T_sim, record_spikes=record_spikes,
+                                             mu_1=_InputBlocks(mu_1), mu_2=_InputBlocks(mu_2),
+                                             recorders=recorders, monitors=monitors) #simulation call returns
 
         return spikes
 
-    def _simulate(self, T_sim, record_spikes=False, mu_1=None, mu_2=None):
-        """Core simulation loop (private method)."""
-        spikes = []
+    def iter_chunks(self, T_sim, chunk, T_burn_in=0.0, record_spikes=True, mu_1=None, mu_2=None,
+                    start_step=0, recorders=None, monitors=None):
+        """
+        Simulate in windows of `chunk` ms, yielding the spikes of each window.
+
+        The network state and the synaptic input in transit are carried from
+        one window to the next, so the spike trains are identical to `run`,
+        while memory is bounded by the window length rather than by `T_sim`.
+        Inputs are requested block by block and may be given as
+
+        - an (n_inputs x n_steps) array or an input source, as for `run`;
+        - a callable `mu(start_step, n_steps)` returning the (n_inputs x
+          n_steps) block starting at `start_step`;
+        - an iterator or generator of consecutive (n_inputs x any) blocks.
+
+        Parameters:
+        T_sim (float): Recording duration (ms)
+        chunk (float): Window length (ms), rounded to whole time steps
+        T_burn_in (float): Burn-in duration without inputs or recording (ms)
+        record_spikes (bool): Whether to record spikes
+        mu_1, mu_2: Inputs of the two input populations (see above)
+        start_step (int): Time step of the recording period to start from,
+            when continuing a run whose state was restored from a checkpoint
+        recorders (list): Online recorders (see recorders.py), started for
+            the whole recording period and updated in every window
+        monitors (list): State monitors, e.g. `recorders.StateMonitor`
+
+        Yields:
+        SpikeTrain: Spikes of one window, with time steps counted from the
+            start of the recording period
+        """
+        n_steps = int(round(T_sim / self.dt))
+        chunk_steps = int(round(chunk / self.dt))
+        if chunk_steps < 1:
+            raise ValueError(f"Chunk length must be at least one time step ({self.dt} ms), got {chunk}")
+        mu_1, mu_2 = _InputBlocks(mu_1), _InputBlocks(mu_2)
+
+        if T_burn_in > 0:
+            self._simulate(T_burn_in, record_spikes=False)
+        for recorder in [*(recorders or ()), *(monitors or ())]:
+            recorder.start(self.net, self.dt, n_steps)
+        for start in range(start_step, n_steps, chunk_steps):
+            n = min(chunk_steps, n_steps - start)
+            _, spikes = self._simulate(n * self.dt, record_spikes=record_spikes,
+                                       mu_1=mu_1, mu_2=mu_2, step_offset=start,
+                                       recorders=recorders, monitors=monitors)
+            yield spikes
+
+    def run_chunked(self, T_sim, chunk, writer, T_burn_in=0.0, mu_1=None, mu_2=None,
+                    start_step=0, on_chunk=None, recorders=None, record_spikes=True, monitors=None):
+        """
+        Simulate in windows of `chunk` ms and pass the spikes of each window to `writer`.
+
+        Parameters:
+        writer: Object with a `write(spikes)` method, e.g. `recording.SpikeWriter`
+        on_chunk (callable): Called as on_chunk(step) after each window has
+            been written, with the number of recording steps completed (e.g.
+            to save a checkpoint)
+        Other parameters as for `iter_chunks`
+
+        Returns:
+        int: Total number of spikes written
+        """
+        n_steps = int(round(T_sim / self.dt))
+        chunk_steps = int(round(chunk / self.dt))
+        n_spikes = 0
+        step = start_step
+        for spikes in self.iter_chunks(T_sim, chunk, T_burn_in=T_burn_in, mu_1=mu_1, mu_2=mu_2,
+                                       start_step=start_step, recorders=recorders,
+                                       record_spikes=record_spikes, monitors=monitors):
+            writer.write(spikes)
+            n_spikes += len(spikes)
+            step = min(step + chunk_steps, n_steps)
+            if on_chunk is not None:
+                on_chunk(step)
+        return n_spikes
+
+    def run_batch(self, trials, T_sim, T_burn_in=0.0, record_spikes=False, mu_1=None, mu_2=None):
+        """
+        Simulate several trials of the network at once, sharing its connectivity.
+
+        The state of trial k (V, last_spike, refractory) is row k of K x N
+        arrays. Its initial potentials and inputs come from the rng_init and
+        rng_input streams that BalancedSpikingNetwork(..., trial=trials[k])
+        would use, so every trial matches a standalone run. With sparse
+        connectivity the spike trains are identical to `run`; with dense
+        connectivity they can differ in the last bits of the synaptic sums.
+        The synaptic step is one matrix product of the columns of neurons that
+        fired in any trial with a (fired x K) spike indicator matrix.
+
+        Parameters:
+        trials (list): Trial numbers
+        T_sim (float): Recording duration (ms)
+        T_burn_in (float): Burn-in duration without inputs or recording (ms)
+        record_spikes (bool): Whether to record spikes
+        mu_1, mu_2: None, one input array or source per trial, or a callable
+            invoked as mu(rng_input) for every trial (mu_1 first, as in the CLI)
+
+        Returns:
+        list: One SpikeTrain per trial, as returned by `run`
+        """
+        if self.integrator != "euler":
+            raise ValueError("run_batch requires integrator='euler'")
+        net = self.net
+        rngs = [net.trial_rngs(trial) for trial in trials]
+        V = np.stack([net.initial_potentials(rng_init) for rng_init, _ in rngs])
+
+        # Inputs of each trial are drawn in CLI order (mu_1, then mu_2) from its own rng_input
+        inputs = [[mu(rng_input) if callable(mu) else (None if mu is None else mu[k])
+                   for mu in (mu_1, mu_2)]
+                  for k, (_, rng_input) in enumerate(rngs)]
+        mu_1s = None if mu_1 is None else [_InputBlocks(mu[0]) for mu in inputs]
+        mu_2s = None if mu_2 is None else [_InputBlocks(mu[1]) for mu in inputs]
+
+        K = len(trials)
+        state = {
+            "V": V,
+            "last_spike": np.full((K, net.N), NO_SPIKE, dtype=np.int32),
+            "refractory": np.zeros((K, net.N), dtype=np.int32),
+            "pending": np.zeros((self.delay_steps, K, net.N), dtype=net.dtype),
+            "pending_pos": 0,
+        }
+        if T_burn_in > 0:
+            self._simulate_batch(T_burn_in, state, record_spikes=False)
+        return self._simulate_batch(T_sim, state, record_spikes=record_spikes, mu_1=mu_1s, mu_2=mu_2s)
+
+    def _batch_counts(self, fired_mask, cols):
+        """Synaptic weight sums (N x K) from the presynaptic columns `cols` that fired."""
+        W = self.net.connectivity
+        S = fired_mask[:, cols].T
+        if not isinstance(W, SparseConnectivity):
+            return W[:, cols] @ S.astype(W.dtype)
+
+        # 0/1 pattern of the fired columns, multiplied by their spike indicators with
+        # excitatory and inhibitory presynaptic neurons in separate blocks of K columns
+        from scipy.sparse import csc_matrix
+        out_indptr, _ = W.outgoing()
+        K = S.shape[1]
+        exc = cols < W.N_E
+        rhs = np.zeros((cols.size, 2 * K), dtype=np.float32)
+        rhs[exc, :K] = S[exc]
+        rhs[~exc, K:] = S[~exc]
+        indptr = np.zeros(cols.size + 1, dtype=out_indptr.dtype)
+        np.cumsum(out_indptr[cols + 1] - out_indptr[cols], out=indptr[1:])
+        targets = W.targets(cols)
+        pattern = csc_matrix((np.ones(targets.size, dtype=np.float32), targets, indptr),
+                             shape=(W.N, cols.size))
+        counts = (pattern @ rhs).astype(np.float64)
+        return W.exc_weight * counts[:, :K] + W.inh_weight * counts[:, K:]
+
+    def _simulate_batch(self, T_sim, state, record_spikes=False, mu_1=None, mu_2=None):
+        """Batched counterpart of `_simulate` over K x N trial states (private method)."""
+        V, last_spike, refractory = state["V"], state["last_spike"], state["refractory"]
+        K, N = V.shape
+        spikes = [SpikeTrain(self.dt) for _ in range(K)]
+        V_th = self.net.V_th
+        input_1_neurons, input_2_neurons = self.net.input_neurons
+        params = self.params
+
+        n_steps = int(round(T_sim / self.dt))
+        refractory_steps = int(np.floor(params.tau_r / self.dt + 1e-6))
+
+        synaptic_input = np.empty((K, N), dtype=V.dtype)
+        external_input = np.empty((K, N), dtype=V.dtype)
+        dV = np.empty((K, N), dtype=V.dtype)
+        is_refractory = np.empty((K, N), dtype=bool)
+        spiked = np.zeros((K, N), dtype=bool)
+        if self.backend == "numba":
+            fired_buffer = np.empty(N, dtype=np.intp)
+
+        for step in range(n_steps):
+            pending = state["pending"][state["pending_pos"]]
+            np.multiply(pending, params.tau_m, out=synaptic_input)
+            synaptic_input /= self.dt
+            pending[:] = 0
+
+            # Inputs of all trials as (K x block steps x n_inputs) blocks
+            if step % _INPUT_BLOCK_STEPS == 0:
+                n = min(_INPUT_BLOCK_STEPS, n_steps - step)
+                block_1 = None if mu_1 is None else np.stack([blocks.read(step, n) for blocks in mu_1])
+                block_2 = None if mu_2 is None else np.stack([blocks.read(step, n) for blocks in mu_2])
+
+            external_input.fill(params.mu_zero)
+            if block_1 is not None:
+                external_input[:, input_1_neurons] += block_1[:, step % _INPUT_BLOCK_STEPS]
+            if block_2 is not None:
+                external_input[:, input_2_neurons] += block_2[:, step % _INPUT_BLOCK_STEPS]
+
+            if self.backend == "numba":
+                spiked[:] = False
+                for k in range(K):
+                    n_fired = self._compiled_step(V[k], V_th, refractory[k], synaptic_input[k], external_input[k],
+                                                  refractory_steps, fired_buffer)
+                    spiked[k, fired_buffer[:n_fired]] = True
+            else:
+                _euler_step(V, V_th, refractory, synaptic_input, external_input, params.E_L, params.V_r,
+                            params.tau_m, self.dt, refractory_steps, dV, is_refractory, spiked)
+
+            cols = np.flatnonzero(spiked.any(axis=0))
+            if cols.size > 0:
+                last_spike[spiked] = step
+                pending += self._batch_counts(spiked, cols).T
+                if record_spikes:
+                    for k in range(K):
+                        spikes[k].append(step, np.flatnonzero(spiked[k]))
+            state["pending_pos"] = (state["pending_pos"] + 1) % self.delay_steps
+
+        np.subtract(last_spike, n_steps, out=last_spike, where=last_spike != NO_SPIKE)
+        return spikes
+
+    def _compiled_step(self, V, V_th, refractory, synaptic_input, external_input, refractory_steps, fired):
+        """Run the numba kernel and return the number of neurons that fired."""
+        params = self.params
+        return self._kernels.lif_step(V, V_th, refractory, synaptic_input, external_input, params.E_L, params.V_r,
+                                      params.tau_m, self.dt, refractory_steps, fired)
+
+    def _outgoing_synapses(self):
+        """Outgoing synapses (indptr, indices, weights) of every neuron, for the exact integrator."""
+        if self._outgoing is None:
+            W = self.net.connectivity
+            if isinstance(W, SparseConnectivity):
+                # Weights follow from the population of the presynaptic neuron
+                self._outgoing = (*W.outgoing(), np.empty(0))
+            else:
+                pre, post = np.nonzero(W.T)
+                out_indptr = np.zeros(W.shape[1] + 1, dtype=np.int64)
+                np.cumsum(np.bincount(pre, minlength=W.shape[1]), out=out_indptr[1:])
+                self._outgoing = out_indptr, post.astype(np.int32), W.T[pre, post].astype(np.float64)
+        return self._outgoing
+
+    def _block_structure(self):
+        """Boundaries of the neuron blocks and offsets of their synapses in the outgoing index."""
+        if self._blocks is None:
+            out_indptr, out_indices = self.net.connectivity.outgoing()
+            bounds = np.linspace(0, self.net.N, self.threads + 1).round().astype(np.int64)
+            self._blocks = bounds, self._kernels.block_offsets(out_indptr, out_indices, bounds)
+        return self._blocks
+
+    def _simulate(self, T_sim, **kwargs):
+        """
+        Core simulation loop (private method).
+
+        `mu_1` and `mu_2` are None or `_InputBlocks`, read from time step
+        `step_offset`; spikes are recorded, and passed to `recorders`, at
+        `step_offset + step`. `monitors` receive the in-place state arrays
+        at the end of every step.
+        """
+        if self.threads is None:
+            return self._simulate_steps(T_sim, **kwargs)
+        with self._kernels.thread_count(self.threads):
+            return self._simulate_steps(T_sim, **kwargs)
+
+    def _simulate_steps(self, T_sim, record_spikes=False, mu_1=None, mu_2=None, step_offset=0, recorders=None,
+                        monitors=None):
+        spikes = SpikeTrain(self.dt)
         V, last_spike, refractory = self.net.V, self.net.last_spike, self.net.refractory
         V_th = self.net.V_th
         W = self.net.connectivity
+        # The exact integrator delivers spikes itself, from a ring buffer of arriving spikes
+        exact = self.integrator == "exact"
+        event = self.propagation == "event" and not exact
+        dense = self.propagation == "dense" and not exact
+        if event and self._pending is None:
+            self._pending = np.zeros((self.delay_steps, self.net.N), dtype=self.net.dtype)
         input_1_neurons, input_2_neurons = self.net.input_neurons
+        params = self.params
+        N = self.net.N
+        kernels = self._kernels
+
+        n_steps = int(round(T_sim / self.dt))
+        refractory_steps = int(np.floor(params.tau_r / self.dt + 1e-6))
 
-        for t in np.arange(0, T_sim, self.dt):
-            refractory = (t - last_spike) <= self.params.tau_r
-            synaptic_input = self.params.tau_m * np.dot(W, (last_spike == t - self.dt).astype(float)) / self.dt
+        # Preallocated per-step buffers
+        dtype = self.net.dtype
+        synaptic_input = np.empty(N, dtype=dtype)
+        external_input = np.empty(N, dtype=dtype)
+        compiled_deposit = self.backend == "numba" and event and isinstance(W, SparseConnectivity)
+        threaded = self.threads is not None
+        if self.backend == "numba":
+            fired_buffer = np.empty(N, dtype=np.intp)
+        if compiled_deposit:
+            out_indptr, out_indices = W.outgoing()
+            n_exc = np.zeros(N, dtype=np.int64)
+            n_inh = np.zeros(N, dtype=np.int64)
+        else:
+            dV = np.empty(N, dtype=dtype)
+            is_refractory = np.empty(N, dtype=bool)
+            spiked = np.empty(N, dtype=bool)
+        if exact:
+            out_indptr, out_indices, out_weights = self._outgoing_synapses()
+            N_E, exc_weight, inh_weight = (W.N_E, W.exc_weight, W.inh_weight) if out_weights.size == 0 \
+                else (self.net.N_E, 0.0, 0.0)
+            if self._arrivals is None:
+                self._arrivals = (np.zeros((self.delay_steps, N), dtype=np.int32),
+                                  np.zeros((self.delay_steps, N)), np.zeros(self.delay_steps, dtype=np.int64))
+                self._spike_offsets = np.zeros(N)
+            arrivals, arrival_offsets, n_arrivals = self._arrivals
+            exact_step = kernels.exact_step if self.backend == "numba" else _exact_step
+            fired_buffer = np.empty(N, dtype=np.intp)
+            fired_offsets = np.empty(N)
+            decay_start = np.ones(N)
+        if threaded:
+            bounds, offsets = self._block_structure()
+            block_fired = np.empty(N, dtype=np.intp)
+            n_block_fired = np.zeros(self.threads, dtype=np.int64)
+            # Spikes of the previous step, delivered at the start of the next kernel call
+            deposit = fired_buffer[:0]
+            deposit_pos = self._pending_pos
+
+        # Arrays handed to state monitors; all are updated in place
+        state = {"V": V, "synaptic_input": synaptic_input, "external_input": external_input}
+
+        # Spikes emitted in the last step of the previous phase arrive in the first step of this one
+        fired = np.flatnonzero(last_spike == -1)
+        if dense:
+            spike_vector = np.zeros(N, dtype=dtype)
+            spike_vector[fired] = 1.0
+
+        profile = self.profile
+        if profile is not None:
+            profile.start_phase()
+
+        for step in range(n_steps):
+            if profile is not None:
+                profile.start_step()
+            if threaded or exact:
+                pass  # Synaptic input is delivered by the update, and charged to "update"
+            elif event:
+                # Input due now was deposited delay_steps steps ago; the slot is reused for new spikes
+                pending = self._pending[self._pending_pos]
+                np.multiply(pending, params.tau_m, out=synaptic_input)
+                synaptic_input /= self.dt
+                pending[:] = 0
+            else:
+                np.multiply(np.dot(W, spike_vector), params.tau_m, out=synaptic_input)
+                synaptic_input /= self.dt
+            if profile is not None:
+                profile.lap("synaptic")
+
+            # Fetch the next time-major blocks of dynamic input
+            if step % _INPUT_BLOCK_STEPS == 0:
+                n = min(_INPUT_BLOCK_STEPS, n_steps - step)
+                block_1 = None if mu_1 is None else mu_1.read(step_offset + step, n)
+                block_2 = None if mu_2 is None else mu_2.read(step_offset + step, n)
 
             # Apply constant input to all neurons
-            external_input = np.full(self.net.N, self.params.mu_zero, dtype=float)
+            external_input.fill(params.mu_zero)
 
             # Apply additional dynamic input to selected neurons, if mu is provided
-            if mu_1 is not None:
-                external_input[input_1_neurons] += mu_1[:, int(t/self.dt)]
-            if mu_2 is not None:
-                external_input[input_2_neurons] += mu_2[:, int(t/self.dt)]
-
-            dV = np.where(refractory, 0, (-(V - self.params.E_L) + synaptic_input + external_input) / self.params.tau_m)
-            V += dV * self.dt
-
-            spiked = (V >= V_th) & ~refractory
-            if np.sum(spiked) > 0:
-                V[spiked] = self.params.V_r
-                last_spike[spiked] = t
+            if block_1 is not None:
+                external_input[input_1_neurons] += block_1[step % _INPUT_BLOCK_STEPS]
+            if block_2 is not None:
+                external_input[input_2_neurons] += block_2[step % _INPUT_BLOCK_STEPS]
+            if profile is not None:
+                profile.lap("input")
+
+            if dense:
+                spike_vector[fired] = 0.0
+
+            if threaded:
+                kernels.threaded_step(bounds, offsets, out_indices, W.N_E, W.exc_weight, W.inh_weight,
+                                      deposit, self._pending, deposit_pos, self._pending_pos, True,
+                                      V, V_th, refractory, synaptic_input, external_input,
+                                      params.E_L, params.V_r, params.tau_m, self.dt, refractory_steps,
+                                      block_fired, n_block_fired, n_exc, n_inh)
+                fired = fired_buffer[:kernels.gather_fired(block_fired, n_block_fired, bounds, fired_buffer)]
+            elif exact:
+                n_arriving = n_arrivals[self._pending_pos]
+                n_fired = exact_step(V, V_th, last_spike, self._spike_offsets, step, synaptic_input, external_input,
+                                     params.E_L, params.V_r, params.tau_m, params.tau_r, self.dt,
+                                     out_indptr, out_indices, out_weights, N_E, exc_weight, inh_weight,
+                                     arrivals[self._pending_pos, :n_arriving], arrival_offsets[self._pending_pos, :n_arriving],
+                                     decay_start, fired_buffer, fired_offsets)
+                fired = np.sort(fired_buffer[:n_fired])
+            elif self.backend == "numba":
+                n_fired = self._compiled_step(V, V_th, refractory, synaptic_input, external_input,
+                                              refractory_steps, fired_buffer)
+                fired = fired_buffer[:n_fired]
+            else:
+                fired = _euler_step(V, V_th, refractory, synaptic_input, external_input, params.E_L, params.V_r,
+                                    params.tau_m, self.dt, refractory_steps, dV, is_refractory, spiked)
+            if profile is not None:
+                profile.lap("update")
+
+            if exact:
+                # Spikes arrive delay_steps steps later, in the order of their offsets within the step
+                order = np.argsort(fired_offsets[:n_fired], kind="stable")
+                arrivals[self._pending_pos, :n_fired] = fired_buffer[order]
+                arrival_offsets[self._pending_pos, :n_fired] = fired_offsets[order]
+                n_arrivals[self._pending_pos] = n_fired
+            if fired.size > 0:
+                last_spike[fired] = step
+                if threaded or exact:
+                    pass  # Delivered by the blocks at the start of the next step, or from the arrivals
+                elif compiled_deposit:
+                    kernels.deposit_spikes(pending, out_indptr, out_indices, fired, W.N_E,
+                                           W.exc_weight, W.inh_weight, n_exc, n_inh)
+                elif event:
+                    pending += propagate(W, fired)
+                else:
+                    spike_vector[fired] = 1.0
+            if profile is not None:
+                profile.lap("propagate")
+
+            if fired.size > 0:
                 if record_spikes:
-                    spikes.extend([(t, i) for i in np.where(spiked)[0]])
+                    spikes.append(step_offset + step, fired)
+                for recorder in recorders or ():
+                    recorder.update(step_offset + step, fired)
+            for monitor in monitors or ():
+                monitor.update(step_offset + step, state)
+            if threaded:
+                deposit, deposit_pos = fired, self._pending_pos
+            if event or exact:
+                self._pending_pos = (self._pending_pos + 1) % self.delay_steps
+            if profile is not None:
+                profile.lap("record")
+                profile.count(fired.size)
 
-            V[refractory] = self.params.V_r
+        if threaded and deposit.size > 0:
+            # Deliver the spikes of the last step, so the pending input matches the other backends
+            kernels.threaded_step(bounds, offsets, out_indices, W.N_E, W.exc_weight, W.inh_weight,
+                                  deposit, self._pending, deposit_pos, self._pending_pos, False,
+                                  V, V_th, refractory, synaptic_input, external_input,
+                                  params.E_L, params.V_r, params.tau_m, self.dt, refractory_steps,
+                                  block_fired, n_block_fired, n_exc, n_inh)
 
-        # Adjust last_spike times for the next phase of simulation
-        last_spike = np.where(last_spike < T_sim, last_spike - T_sim, -np.inf)
+        if profile is not None:
+            profile.stop_phase()
+
+        # Express last_spike relative to the start of the next phase of simulation
+        np.subtract(last_spike, n_steps, out=last_spike, where=last_spike != NO_SPIKE)
 
         final_state = (V, last_spike, refractory)
         self.net.set_state(final_state)  #update network state
 
-        if record_spikes:
-            return final_state, spikes
-        else:
-            return final_state, []  # Return empty spike list
+        return final_state, spikes  # Empty unless record_spikes
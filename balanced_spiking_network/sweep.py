@@ -0,0 +1,197 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .cli import build_parser, build_network, check_arguments, run, output_format
+
+# Arguments that determine the connectivity and input neurons of a network
+STRUCTURE_KEYS = ("N", "C", "f", "g", "J_mean", "session",
+                  "connectivity_format", "connectivity_method", "dtype")
+
+# Arguments that do not change the result of a run
+NON_RESULT_KEYS = ("output", "format", "cache_dir", "profile", "threads")
+
+# Arguments that conflict with the one output file per run written by a sweep
+UNSUPPORTED_KEYS = ("output", "chunk", "checkpoint_interval", "resume")
+
+# (connectivity, input_neurons) built by this worker process, least recently used first
+_structure_cache = OrderedDict()
+
+
+def expand_grid(grid):
+    """
+    Expand a parameter grid into one specification per run.
+
+    Parameters:
+    grid (dict): Maps `bsn` argument names to a list of values to sweep, or
+        to a single value that is held fixed
+
+    Returns:
+    list: One dict per combination, in itertools.product order
+    """
+    names = list(grid)
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def run_arguments(spec):
+    """Parse a run specification exactly as `bsn` would parse the same options."""
+    parser = build_parser()
+    unknown = set(spec) - set(vars(parser.parse_args([])))
+    if unknown:
+        raise ValueError(f"Unknown parameter(s): {', '.join(sorted(unknown))}")
+    argv = []
+    for name, value in spec.items():
+        argv += [f"--{name}", str(value)]
+    return parser.parse_args(argv)
+
+
+def run_id(args):
+    """Stable identifier of a run, hashed from all arguments that affect its result."""
+    spec = {name: value for name, value in vars(args).items() if name not in NON_RESULT_KEYS}
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def structure_key(args):
+    return tuple(getattr(args, name) for name in STRUCTURE_KEYS)
+
+
+def _network(args, cache_size, shared=None):
+    """Build the network of a run, reusing connectivity already built by this worker."""
+    if shared is not None:
+        return build_network(args, shared=shared)
+
+    key = structure_key(args)
+    if key in _structure_cache:
+        _structure_cache.move_to_end(key)
+        connectivity, input_neurons = _structure_cache[key]
+        return build_network(args, connectivity=connectivity, input_neurons=input_neurons)
+
+    net = build_network(args)
+    _structure_cache[key] = (net.connectivity, net.input_neurons)
+    while len(_structure_cache) > cache_size:
+        _structure_cache.popitem(last=False)
+    return net
+
+
+def _run(spec, path, cache_size, shared=None):
+    """Worker task: simulate one run and write its output atomically."""
+    args = run_arguments(spec)
+    root, ext = os.path.splitext(path)
+    args.output = root + ".tmp" + ext
+    run(args, _network(args, cache_size, shared))
+    os.replace(args.output, path)
+    return path
+
+
+def run_sweep(grid, output_dir, max_workers=None, cache_size=2, share_memory=False):
+    """
+    Run every combination of a parameter grid on a pool of worker processes.
+
+    Each run writes the data `bsn` would save to `run_<id>.npz` (`.pkl` if
+    the grid sets `"format": "pickle"`) in `output_dir` as soon as it
+    finishes, and is recorded with its full arguments in `manifest.jsonl`.
+    Runs whose output already exists are skipped, so an interrupted sweep
+    resumes where it stopped. A run that fails is recorded in the manifest
+    with its "error" and writes no output; the other runs continue, and the
+    failed runs are retried when the sweep is run again. Runs sharing a network are submitted together
+    and workers keep the last `cache_size` networks, so connectivity is not
+    rebuilt for every run. With `share_memory`, each distinct network is
+    instead built once by this process and published in shared memory, and
+    all workers attach to that single read-only copy.
+
+    All runs are checked as `bsn` checks its options before any of them
+    starts, raising ValueError for an invalid combination; options that would
+    write other outputs than one file per run ("output", "chunk",
+    "checkpoint_interval", "resume") are rejected.
+
+    Parameters:
+    grid (dict): Parameter grid, see `expand_grid`
+    output_dir (str): Directory receiving the output files
+    max_workers (int): Number of worker processes (default: number of CPUs)
+    cache_size (int): Networks kept in memory per worker
+    share_memory (bool): Share one copy of each network among all workers
+
+    Returns:
+    list: Output paths of all runs in the grid, in `expand_grid` order
+        (failed runs have no file at their path)
+    """
+    unsupported = set(grid) & set(UNSUPPORTED_KEYS)
+    if unsupported:
+        raise ValueError(f"Sweeps do not support: {', '.join(sorted(unsupported))}")
+    runs = []
+    for spec in expand_grid(grid):
+        args = run_arguments(spec)
+        check_arguments(args)
+        ext = ".pkl" if output_format(args, "") == "pickle" else ".npz"
+        runs.append((spec, args, os.path.join(output_dir, f"run_{run_id(args)}{ext}")))
+
+    os.makedirs(output_dir, exist_ok=True)
+    todo = [entry for entry in runs if not os.path.exists(entry[2])]
+    todo.sort(key=lambda entry: structure_key(entry[1]))
+
+    shared = {}
+    try:
+        if share_memory:
+            for _, args, _ in todo:
+                key = structure_key(args)
+                if key not in shared:
+                    shared[key] = build_network(args).share()
+
+        if todo:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor, \
+                    open(os.path.join(output_dir, "manifest.jsonl"), "a") as manifest:
+                futures = {executor.submit(_run, spec, path, cache_size, shared.get(structure_key(args))): (args, path)
+                           for spec, args, path in todo}
+                for future in as_completed(futures):
+                    args, path = futures[future]
+                    record = {name: value for name, value in vars(args).items() if name != "output"}
+                    record["file"] = os.path.basename(path)
+                    try:
+                        future.result()
+                    except Exception as error:
+                        record["error"] = f"{type(error).__name__}: {error}"
+                    manifest.write(json.dumps(record) + "\n")
+                    manifest.flush()
+    finally:
+        for handle in shared.values():
+            handle.unlink()
+
+    return [path for _, _, path in runs]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="bsn sweep",
+        description="Run a parameter sweep of balanced spiking network simulations in parallel"
+    )
+    parser.add_argument("grid", type=str,
+                        help="JSON file mapping bsn arguments to lists of values (single values are held fixed)")
+    parser.add_argument("-o", "--output_dir", type=str, default="sweep",
+                        help="Directory receiving one spike data file per run")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--cache_size", type=int, default=2,
+                        help="Number of networks kept in memory per worker")
+    parser.add_argument("--share_memory", action="store_true",
+                        help="Build each network once and share it read-only among workers")
+
+    args = parser.parse_args(argv)
+
+    with open(args.grid) as f:
+        grid = json.load(f)
+
+    try:
+        paths = run_sweep(grid, args.output_dir, max_workers=args.workers, cache_size=args.cache_size,
+                          share_memory=args.share_memory)
+    except ValueError as error:
+        parser.error(str(error))
+    failed = sum(not os.path.exists(path) for path in paths)
+    if failed:
+        print(f"{failed} of {len(paths)} runs failed, see {os.path.join(args.output_dir, 'manifest.jsonl')}",
+              file=sys.stderr)
+        return 1
@@ -1,5 +1,6 @@
 import numpy as np
 from .parameters import NeuralParameters
+from .connectivity import SparseConnectivity
 
 
 def generate_heterogeneous_thresholds(V_th_mean, V_th_std, N, rng, distribution="uniform"):
@@ -43,13 +44,110 @@ def generate_heterogeneous_thresholds(V_th_mean, V_th_std, N, rng, distribution=
 
 
 
-def create_connectivity_matrix(N, N_E, C_E, C_I, mean_weight, g, rng):
+def sample_without_replacement(n_rows, n_pool, k, rng):
+    """
+    Draw `n_rows` independent sets of `k` distinct integers from range(n_pool).
+
+    Dense draws (k comparable to n_pool) take the k smallest of one random key
+    per candidate, computed in row batches with `argpartition`. Sparse draws
+    sample with replacement and redraw duplicates until every row is distinct,
+    which visits only O(k) candidates per row. Both are deterministic for a
+    given `rng` state.
+
+    Parameters:
+    n_rows (int): Number of independent sets
+    n_pool (int): Size of the population to sample from
+    k (int): Size of each set
+    rng (numpy.random.Generator): Random number generator
+
+    Returns:
+    numpy.ndarray: (n_rows, k) int32 array, each row sorted
+    """
+    if k > n_pool:
+        raise ValueError(f"Cannot take {k} distinct samples from a population of {n_pool}")
+    if k == 0 or n_rows == 0:
+        return np.empty((n_rows, k), dtype=np.int32)
+
+    if 4 * k >= n_pool:
+        out = np.empty((n_rows, k), dtype=np.int32)
+        batch = max(1, (1 << 22) // n_pool)
+        for start in range(0, n_rows, batch):
+            stop = min(start + batch, n_rows)
+            keys = rng.random((stop - start, n_pool))
+            out[start:stop] = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        out.sort(axis=1)
+        return out
+
+    out = rng.integers(0, n_pool, size=(n_rows, k), dtype=np.int32)
+    out.sort(axis=1)
+    while True:
+        duplicate = np.zeros(out.shape, dtype=bool)
+        duplicate[:, 1:] = out[:, 1:] == out[:, :-1]
+        n_duplicates = np.count_nonzero(duplicate)
+        if n_duplicates == 0:
+            return out
+        out[duplicate] = rng.integers(0, n_pool, size=n_duplicates, dtype=np.int32)
+        out.sort(axis=1)
+
+
+
+def row_connection_indices(rows, N, N_E, C_E, C_I, seed_seq):
+    """
+    Presynaptic indices of the neurons in `rows`, each drawn from its own generator.
+
+    The generator of row i is seeded with child i of `seed_seq` (its spawn
+    key extended by i), so any range of rows can be built independently of
+    the others, e.g. by the rank of a distributed run that owns them.
+
+    Parameters:
+    rows (range): Postsynaptic neurons
+    seed_seq (numpy.random.SeedSequence): Seed of the connectivity
+
+    Returns:
+    numpy.ndarray: (len(rows), C_E + C_I) int32 array
+    """
+    indices = np.empty((len(rows), C_E + C_I), dtype=np.int32)
+    for k, i in enumerate(rows):
+        rng = np.random.default_rng(np.random.SeedSequence(seed_seq.entropy, spawn_key=seed_seq.spawn_key + (i,)))
+        indices[k, :C_E] = rng.choice(N_E, C_E, replace=False)
+        indices[k, C_E:] = N_E + rng.choice(N - N_E, C_I, replace=False)
+    return indices
+
+
+
+def _connection_indices(N, N_E, C_E, C_I, rng, method):
+    """Presynaptic indices of every neuron as an (N, C_E + C_I) int32 array."""
+    if method == "legacy":
+        indices = np.empty((N, C_E + C_I), dtype=np.int32)
+        for i in range(N):
+            # Select random excitatory and inhibitory connections
+            indices[i, :C_E] = rng.choice(N_E, C_E, replace=False)
+            indices[i, C_E:] = N_E + rng.choice(N - N_E, C_I, replace=False)
+        return indices
+    elif method == "v2":
+        exc = sample_without_replacement(N, N_E, C_E, rng)
+        inh = sample_without_replacement(N, N - N_E, C_I, rng)
+        inh += N_E
+        return np.concatenate([exc, inh], axis=1)
+    elif method == "rows":
+        return row_connection_indices(range(N), N, N_E, C_E, C_I, rng.bit_generator.seed_seq)
+    else:
+        raise ValueError(f"Invalid method: {method}. Use 'legacy', 'v2' or 'rows'")
+
+
+
+def create_connectivity_matrix(N, N_E, C_E, C_I, mean_weight, g, rng, method="legacy", dtype=np.float64):
     """
     Create a connectivity matrix for a neural network.
 
     Parameters:
     rng (numpy.random.Generator): Random number generator
     mean_weight (float): Mean synaptic weight
+    method (str): "legacy" (per-neuron rng.choice, bit-compatible with
+        earlier releases), "v2" (vectorized batch sampling) or "rows" (one
+        generator per neuron spawned from the seed of `rng`, see
+        `row_connection_indices`)
+    dtype (numpy.dtype): Floating point type of the matrix (float32 halves its memory)
 
     Returns:
     numpy.ndarray: NxN connectivity matrix where N is the total number of neurons
@@ -61,31 +159,59 @@ def create_connectivity_matrix(N, N_E, C_E, C_I, mean_weight, g, rng):
     C_I (int): Number of inhibitory connections per neuron
     g (float): Relative strength of inhibitory to excitatory synapses
     """
-    W = np.zeros((N, N))
+    W = np.zeros((N, N), dtype=dtype)
 
     exc_weight = mean_weight
     inh_weight = -mean_weight * g
 
-    for i in range(N):
-        if i < N_E:  # Excitatory neuron
-            # Select random excitatory and inhibitory connections
-            exc_connections = rng.choice(N_E, C_E, replace=False)
-            inh_connections = rng.choice(range(N_E, N), C_I, replace=False)
+    indices = _connection_indices(N, N_E, C_E, C_I, rng, method)
+    rows = np.arange(N)[:, None]
 
-            # Assign constant weights
-            W[i, exc_connections] = exc_weight
-            W[i, inh_connections] = inh_weight
+    # Assign constant weights
+    W[rows, indices[:, :C_E]] = exc_weight
+    W[rows, indices[:, C_E:]] = inh_weight
 
-        else:  # Inhibitory neuron
-            # Select random excitatory and inhibitory connections
-            exc_connections = rng.choice(N_E, C_E, replace=False)
-            inh_connections = rng.choice(range(N_E, N), C_I, replace=False)
+    return W
 
-            # Assign constant weights
-            W[i, exc_connections] = exc_weight
-            W[i, inh_connections] = inh_weight
 
-    return W
+
+def create_sparse_connectivity_matrix(N, N_E, C_E, C_I, mean_weight, g, rng, method="legacy", rows=None):
+    """
+    Create a sparse (CSR) connectivity matrix for a neural network.
+
+    Draws exactly the same connections as `create_connectivity_matrix` for a
+    given `rng` and `method`, but stores only the int32 presynaptic indices of
+    each row plus one weight per population, so memory scales with N*C
+    instead of N^2.
+
+    Parameters:
+    rng (numpy.random.Generator): Random number generator
+    mean_weight (float): Mean synaptic weight
+    method (str): "legacy", "v2" or "rows", see `create_connectivity_matrix`
+    rows (range): Build only the rows of these neurons (method "rows" only)
+
+    Returns:
+    SparseConnectivity: Connectivity with C_E + C_I presynaptic partners per neuron
+
+    Global variables used:
+    N (int): Total number of neurons
+    N_E (int): Number of excitatory neurons
+    C_E (int): Number of excitatory connections per neuron
+    C_I (int): Number of inhibitory connections per neuron
+    g (float): Relative strength of inhibitory to excitatory synapses
+    """
+    C = C_E + C_I
+    if rows is None:
+        indices = _connection_indices(N, N_E, C_E, C_I, rng, method)
+    elif method == "rows":
+        indices = row_connection_indices(rows, N, N_E, C_E, C_I, rng.bit_generator.seed_seq)
+    else:
+        raise ValueError("Building a subset of rows requires method='rows'")
+    indices.sort(axis=1)
+    indptr = np.arange(len(indices) + 1, dtype=np.int64) * C
+
+    return SparseConnectivity(N, N_E, indptr, indices.ravel(),
+                              exc_weight=mean_weight, inh_weight=-mean_weight * g)
 
 
 
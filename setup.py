@@ -43,6 +43,10 @@ setup(
         'numpy',
         'scipy'
     ],
+    extras_require={
+        'numba': ['numba'],
+        'mpi': ['mpi4py']
+    },
     entry_points={
         'console_scripts': [
             'bsn = balanced_spiking_network.cli:main'
@@ -0,0 +1,28 @@
+import os
+import numpy as np
+import pytest
+from balanced_spiking_network import BalancedSpikingNetwork
+from balanced_spiking_network.cache import NetworkCache
+
+
+@pytest.mark.parametrize("connectivity_format", ["dense", "sparse"])
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_cached_network_matches_generated(tmp_path, connectivity_format, dtype):
+    kwargs = dict(N=500, C=50, connectivity_format=connectivity_format, dtype=dtype)
+    BalancedSpikingNetwork(cache=str(tmp_path), **kwargs)
+    cached = BalancedSpikingNetwork(cache=str(tmp_path), **kwargs)
+    generated = BalancedSpikingNetwork(**kwargs)
+    if connectivity_format == "dense":
+        assert cached.connectivity.dtype == generated.connectivity.dtype
+        assert np.array_equal(cached.connectivity, generated.connectivity)
+        assert not any(name.startswith("W") for entry in os.scandir(tmp_path) for name in os.listdir(entry.path))
+    else:
+        assert np.array_equal(cached.connectivity.indices, generated.connectivity.indices)
+    assert np.array_equal(cached.V_th, generated.V_th)
+
+
+def test_evicted_entry_is_a_miss(tmp_path):
+    net = BalancedSpikingNetwork(N=500, C=50, cache=str(tmp_path))
+    cache = NetworkCache(str(tmp_path))
+    os.remove(os.path.join(str(tmp_path), cache.key(net), "V_th.npy"))
+    assert cache.load(net) is None
@@ -0,0 +1,27 @@
+import json
+import numpy as np
+import pytest
+from balanced_spiking_network.cli import main
+from balanced_spiking_network.recording import load_spikes
+
+RUN = ["--N", "500", "--C", "50", "-d", "200", "--chunk", "50",
+       "--connectivity_format", "sparse", "--mu_1", "sine"]
+
+
+@pytest.mark.parametrize("integrator", ["euler", "exact"])
+def test_resume_matches_uninterrupted_run(tmp_path, integrator):
+    reference = str(tmp_path / "reference")
+    resumed = str(tmp_path / "resumed")
+    run = RUN + ["--integrator", integrator]
+    main(run + ["-o", reference])
+    # Checkpoints after 150 ms only, so the resumed run recomputes the last chunk
+    main(run + ["--checkpoint_interval", "120", "-o", resumed])
+    with open(tmp_path / "resumed" / "metadata.json") as f:
+        assert json.load(f)["n_spikes"] > 0
+
+    main(["--resume", resumed])
+
+    expected, actual = load_spikes(reference), load_spikes(resumed)
+    assert len(expected["spikes"]) > 0
+    assert actual["spikes"] == expected["spikes"]
+    assert np.array_equal(actual["rng_check"], expected["rng_check"])
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from balanced_spiking_network import BalancedSpikingNetwork, SimulationEngine
+from balanced_spiking_network.inputs import generate_input_sine
+from balanced_spiking_network.recording import SpikeTrain, SpikeWriter, load_spikes
+
+NETWORK = dict(N=600, C=60, mu_zero=18, connectivity_format="sparse")
+T_SIM, T_BURN_IN, CHUNK = 100.0, 20.0, 30.0
+
+
+def setup(integrator):
+    net = BalancedSpikingNetwork(**NETWORK)
+    mu_1 = generate_input_sine(net.rng_input, T_SIM, len(net.input_neurons[0]), net.params.dt)
+    return SimulationEngine(net, delay=0.4, integrator=integrator), mu_1
+
+
+def reference(integrator):
+    engine, mu_1 = setup(integrator)
+    spikes = engine.run(T_SIM, T_burn_in=T_BURN_IN, record_spikes=True, mu_1=mu_1)
+    assert len(spikes) > 0
+    return spikes
+
+
+@pytest.mark.parametrize("integrator", ["euler", "exact"])
+@pytest.mark.parametrize("blocks", [False, True])
+def test_iter_chunks_matches_run(integrator, blocks):
+    engine, mu_1 = setup(integrator)
+    if blocks:
+        # Consecutive blocks of uneven length, not aligned with the chunks
+        mu_1 = iter(np.array_split(mu_1, 7, axis=1))
+    chunks = list(engine.iter_chunks(T_SIM, CHUNK, T_burn_in=T_BURN_IN, mu_1=mu_1))
+    assert len(chunks) == 4
+    spikes = SpikeTrain.from_arrays(np.concatenate([chunk.steps for chunk in chunks]),
+                                    np.concatenate([chunk.neurons for chunk in chunks]), engine.dt)
+    assert spikes == reference(integrator)
+
+
+@pytest.mark.parametrize("integrator", ["euler", "exact"])
+def test_run_chunked_matches_run(tmp_path, integrator):
+    engine, mu_1 = setup(integrator)
+    writer = SpikeWriter(str(tmp_path / "spikes"), engine.dt)
+    n_spikes = engine.run_chunked(T_SIM, CHUNK, writer, T_burn_in=T_BURN_IN, mu_1=mu_1)
+    expected = reference(integrator)
+    assert n_spikes == len(expected)
+    assert load_spikes(str(tmp_path / "spikes"))["spikes"] == expected
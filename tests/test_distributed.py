@@ -0,0 +1,33 @@
+import functools
+import pytest
+from balanced_spiking_network import BalancedSpikingNetwork, SimulationEngine
+from balanced_spiking_network.cli import build_parser, make_inputs
+from balanced_spiking_network.distributed import ConnectionTransport, DistributedEngine, PartitionedNetwork, run_local
+
+NETWORK = dict(N=600, C=60, mu_zero=18, connectivity_format="sparse", connectivity_method="rows")
+T_SIM, T_BURN_IN = 100.0, 20.0
+
+
+def reference(inputs, delay):
+    net = BalancedSpikingNetwork(**NETWORK)
+    mu_1, mu_2 = inputs(net)
+    return SimulationEngine(net, delay=delay).run(T_SIM, T_burn_in=T_BURN_IN, record_spikes=True,
+                                                  mu_1=mu_1, mu_2=mu_2)
+
+
+# delay=None exchanges spikes after every step, delay=0.4 every 4 steps
+@pytest.mark.parametrize("delay", [None, 0.4])
+@pytest.mark.parametrize("size", [1, 3])
+def test_run_local_matches_single_process(size, delay):
+    args = build_parser().parse_args(["--duration", str(T_SIM), "--mu_1", "sine"])
+    inputs = functools.partial(make_inputs, args)
+    expected = reference(inputs, delay)
+    spikes = run_local(size, T_SIM, T_burn_in=T_BURN_IN, inputs=inputs, delay=delay, **NETWORK)
+    assert len(expected) > 0
+    assert spikes == expected
+
+
+def test_exact_integrator_is_rejected():
+    net = PartitionedNetwork(0, 1, **NETWORK)
+    with pytest.raises(ValueError, match="integrator"):
+        DistributedEngine(net, ConnectionTransport(0, {}), integrator="exact")
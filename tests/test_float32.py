@@ -0,0 +1,26 @@
+import numpy as np
+from balanced_spiking_network import BalancedSpikingNetwork, SimulationEngine
+from balanced_spiking_network.recorders import SpikeCountRecorder, PopulationRateRecorder, ISIRecorder
+
+# Relative tolerances of float32 against float64 documented in the README
+RATE_TOLERANCE = 1e-4
+CV_TOLERANCE = 5e-3
+POPULATION_TOLERANCE = 5e-3
+
+
+def statistics(dtype):
+    """Mean rate, mean ISI CV and E population rate fluctuations of the README example."""
+    net = BalancedSpikingNetwork(N=10000, C=1000, mu_zero=18, connectivity_format="sparse", dtype=dtype)
+    recorders = [SpikeCountRecorder(), PopulationRateRecorder(bin_size=5.0), ISIRecorder()]
+    SimulationEngine(net).run(1000.0, T_burn_in=200.0, recorders=recorders)
+    counts, population, isi = recorders
+    return counts.rates.mean(), np.nanmean(isi.cv), population.rates[0].std()
+
+
+def test_float32_statistics_match_float64():
+    rate_64, cv_64, population_64 = statistics(np.float64)
+    rate_32, cv_32, population_32 = statistics(np.float32)
+    assert rate_64 > 0
+    assert abs(rate_32 - rate_64) <= RATE_TOLERANCE * rate_64
+    assert abs(cv_32 - cv_64) <= CV_TOLERANCE * cv_64
+    assert abs(population_32 - population_64) <= POPULATION_TOLERANCE * population_64
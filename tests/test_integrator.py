@@ -0,0 +1,97 @@
+import math
+import numpy as np
+import pytest
+from balanced_spiking_network import BalancedSpikingNetwork, SimulationEngine
+from balanced_spiking_network.kernels import HAVE_NUMBA, exact_step
+from balanced_spiking_network.recorders import SpikeCountRecorder, ISIRecorder
+from balanced_spiking_network.simulation import _exact_step
+
+needs_numba = pytest.mark.skipif(not HAVE_NUMBA, reason="numba is not installed")
+STEPS = [_exact_step] + ([exact_step] if HAVE_NUMBA else [])
+E_L, V_R, TAU_M, TAU_R, DT = -70.0, -75.0, 10.0, 2.0, 0.5
+
+
+def step_neurons(step_function, V, external_input, step, last_spike, spike_offsets,
+                 arrivals=(), arrival_offsets=(), weight=0.0):
+    """One exact step of unconnected neurons, except for `arrivals` of neuron 0 projecting onto neuron 1."""
+    N = V.size
+    out_indptr = np.array([0, 1] + [1] * (N - 1), dtype=np.int64)
+    out_indices = np.array([1], dtype=np.int32)
+    fired, fired_offsets = np.empty(N, dtype=np.intp), np.empty(N)
+    n_fired = step_function(V, np.full(N, -55.0), last_spike, spike_offsets, step, np.empty(N), external_input,
+                            E_L, V_R, TAU_M, TAU_R, DT, out_indptr, out_indices, np.array([weight]), N, 0.0, 0.0,
+                            np.array(arrivals, dtype=np.int32), np.array(arrival_offsets, dtype=np.float64),
+                            np.ones(N), fired, fired_offsets)
+    return fired[:n_fired], fired_offsets[:n_fired]
+
+
+@pytest.mark.parametrize("step_function", STEPS)
+def test_exact_step_interpolates_threshold_crossing(step_function):
+    # V relaxes from E_L towards -50 mV and crosses -55 mV at tau_m * log(20 / 5)
+    V, last_spike, spike_offsets = np.full(2, E_L), np.full(2, np.iinfo(np.int32).min, dtype=np.int32), np.zeros(2)
+    crossing = TAU_M * math.log(4.0)
+    for step in range(int(crossing / DT) + 1):
+        fired, offsets = step_neurons(step_function, V, np.array([20.0, 0.0]), step, last_spike, spike_offsets)
+    assert list(fired) == [0]
+    assert step * DT + offsets[0] == pytest.approx(crossing, abs=1e-9)
+    assert V[0] == V_R
+
+    # Refractory until tau_r after the spike time, then relaxing again from V_r
+    for step in range(step + 1, step + 6):
+        step_neurons(step_function, V, np.array([20.0, 0.0]), step, last_spike, spike_offsets)
+    free = crossing + TAU_R
+    expected = -50.0 + (V_R + 50.0) * math.exp(-((step + 1) * DT - free) / TAU_M)
+    assert V[0] == pytest.approx(expected, abs=1e-9)
+
+
+@pytest.mark.parametrize("step_function", STEPS)
+def test_exact_step_fires_at_arrival_offset(step_function):
+    V, last_spike, spike_offsets = np.array([E_L, -56.0]), np.full(2, np.iinfo(np.int32).min, dtype=np.int32), \
+        np.zeros(2)
+    fired, offsets = step_neurons(step_function, V, np.zeros(2), 0, last_spike, spike_offsets,
+                                  arrivals=[0], arrival_offsets=[0.2], weight=2.0)
+    # Neuron 1 decays towards E_L until the arrival, where the jump takes it over the threshold
+    assert list(fired) == [1]
+    assert offsets[0] == 0.2
+    assert spike_offsets[1] == 0.2 and last_spike[1] == 0
+
+
+@needs_numba
+@pytest.mark.parametrize("connectivity_format", ["dense", "sparse"])
+def test_exact_integrator_backends_agree(connectivity_format):
+    spikes = []
+    for backend in ("numpy", "numba"):
+        net = BalancedSpikingNetwork(N=1000, C=100, mu_zero=18, dt=0.5, connectivity_format=connectivity_format)
+        engine = SimulationEngine(net, backend=backend, integrator="exact")
+        spikes.append(engine.run(200.0, record_spikes=True))
+    assert len(spikes[0]) > 0
+    assert spikes[0] == spikes[1]
+
+
+def statistics(dt, integrator):
+    net = BalancedSpikingNetwork(N=5000, C=500, J_mean=0.2, mu_zero=20, dt=dt, connectivity_format="sparse")
+    recorders = [SpikeCountRecorder(), ISIRecorder()]
+    backend = "numba" if HAVE_NUMBA else "numpy"
+    SimulationEngine(net, delay=1.0, backend=backend, integrator=integrator).run(1000.0, T_burn_in=200.0,
+                                                                                 recorders=recorders)
+    counts, isi = recorders
+    return counts.rates.mean(), np.nanmean(isi.cv)
+
+
+def test_exact_integrator_closer_to_reference_than_euler():
+    # Reference: Euler at dt = 0.1 ms. At dt = 0.5 ms Euler lowers the mean rate by
+    # about 3 % and raises the ISI CV by about 5 %; the exact integrator stays closer
+    rate_reference, cv_reference = statistics(0.1, "euler")
+    rate_euler, cv_euler = statistics(0.5, "euler")
+    rate_exact, cv_exact = statistics(0.5, "exact")
+    assert rate_reference > 0
+    assert abs(rate_exact - rate_reference) < abs(rate_euler - rate_reference)
+    assert abs(cv_exact - cv_reference) < abs(cv_euler - cv_reference)
+
+
+def test_exact_integrator_options():
+    with pytest.raises(ValueError, match="tau_r"):
+        SimulationEngine(BalancedSpikingNetwork(N=100, C=10, dt=2.5), integrator="exact")
+    engine = SimulationEngine(BalancedSpikingNetwork(N=100, C=10), integrator="exact")
+    with pytest.raises(ValueError, match="run_batch"):
+        engine.run_batch([0, 1], 10.0)
@@ -0,0 +1,37 @@
+import functools
+import pytest
+from balanced_spiking_network import BalancedSpikingNetwork, SimulationEngine
+from balanced_spiking_network.cli import build_parser, make_inputs
+from balanced_spiking_network.kernels import HAVE_NUMBA
+
+pytestmark = pytest.mark.skipif(not HAVE_NUMBA, reason="numba is not installed")
+
+NETWORK = dict(N=600, C=60, mu_zero=18)
+T_SIM, T_BURN_IN = 100.0, 20.0
+
+
+def simulate(connectivity_format, delay=None, **engine_kwargs):
+    args = build_parser().parse_args(["--duration", str(T_SIM), "--mu_1", "sine"])
+    inputs = functools.partial(make_inputs, args)
+    net = BalancedSpikingNetwork(connectivity_format=connectivity_format, **NETWORK)
+    mu_1, mu_2 = inputs(net)
+    engine = SimulationEngine(net, propagation="event", delay=delay, **engine_kwargs)
+    return engine.run(T_SIM, T_burn_in=T_BURN_IN, record_spikes=True, mu_1=mu_1, mu_2=mu_2)
+
+
+@pytest.mark.parametrize("delay", [None, 0.4])
+@pytest.mark.parametrize("connectivity_format", ["dense", "sparse"])
+def test_numba_backend_matches_numpy(connectivity_format, delay):
+    expected = simulate(connectivity_format, delay)
+    assert len(expected) > 0
+    assert simulate(connectivity_format, delay, backend="numba") == expected
+
+
+@pytest.mark.parametrize("threads", [1, 3])
+def test_threaded_step_matches_serial(threads):
+    import numba
+    previous = numba.get_num_threads()
+    expected = simulate("sparse", 0.4, backend="numba")
+    assert len(expected) > 0
+    assert simulate("sparse", 0.4, backend="numba", threads=threads) == expected
+    assert numba.get_num_threads() == previous
@@ -0,0 +1,28 @@
+import functools
+import pytest
+from balanced_spiking_network import BalancedSpikingNetwork, SimulationEngine
+from balanced_spiking_network.inputs import generate_input_sine
+from balanced_spiking_network.kernels import HAVE_NUMBA
+
+NETWORK = dict(N=600, C=60, mu_zero=18, connectivity_format="sparse")
+T_SIM, T_BURN_IN = 100.0, 20.0
+TRIALS = [0, 1, 4]
+
+
+def sine(net, rng):
+    return generate_input_sine(rng, T_SIM, len(net.input_neurons[0]), net.params.dt)
+
+
+@pytest.mark.parametrize("backend", [
+    "numpy", pytest.param("numba", marks=pytest.mark.skipif(not HAVE_NUMBA, reason="numba is not installed"))])
+@pytest.mark.parametrize("delay", [None, 0.4])
+def test_run_batch_matches_standalone_runs(delay, backend):
+    net = BalancedSpikingNetwork(**NETWORK)
+    batch = SimulationEngine(net, delay=delay, backend=backend).run_batch(TRIALS, T_SIM, T_burn_in=T_BURN_IN, record_spikes=True,
+                                                                          mu_1=functools.partial(sine, net))
+    for trial, spikes in zip(TRIALS, batch):
+        net = BalancedSpikingNetwork(trial=trial, **NETWORK)
+        expected = SimulationEngine(net, delay=delay).run(T_SIM, T_burn_in=T_BURN_IN, record_spikes=True,
+                                                          mu_1=sine(net, net.rng_input))
+        assert len(expected) > 0
+        assert spikes == expected